@@ -1,19 +1,38 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
 from werkzeug.utils import secure_filename
 import jwt
+import json
+import redis
 import datetime
+import time
 from functools import wraps
 import os
 
 from services.celery_worker import process_s3_videos_task
 from celery.result import AsyncResult
-# Import the new S3 stats utility
-from services.s3_utils import upload_file_to_s3, list_videos_in_folder, check_file_exists, get_s3_usage_stats, generate_presigned_url
+from botocore.exceptions import ClientError
+from services.s3_utils import list_videos_in_folder, check_file_exists, generate_presigned_url, presigned_url_cache_stats, raw_video_folder, processed_frames_folder, is_raw_video_key
+from services.s3_stream import S3MultipartWriter
+from services.form_stream import iter_form_data
+from services.video_index import video_index
+from services.stats_store import get_usage_stats, reconcile_usage_stats, record_video_upload
+from services.task_progress import get_child_task_ids, publish_task_event, subscribe_task_events
+from services.video_manifest import list_video_manifests
+from services.token_cache import verified_token_cache
 
 # Mock User Data & Roles
 USERS = { "admin": "123", "user": "123", "admin1": "Uploader@123", "viewer": "123" }
 ADMIN_ROLES = { "admin": "standard", "user": "standard", "admin1": "s3_uploader", "viewer": "viewer" }
 ALLOWED_EXTENSIONS = {'mp4', 'avi', 'mov'}
+UPLOAD_FORM_FIELDS = ('upload_date', 'camera_angle', 'video_type', 'user_name')
+GALLERY_DEFAULT_PAGE_SIZE = 48
+GALLERY_MAX_PAGE_SIZE = 200
+TERMINAL_TASK_STATES = ('SUCCESS', 'FAILURE', 'REVOKED')
+# Comment line sent on a quiet /task-events stream so proxies keep it open
+SSE_KEEPALIVE_SECONDS = float(os.getenv('SSE_KEEPALIVE_SECONDS', 15))
+# Streams are closed after this long; clients reconnect and get a fresh snapshot
+SSE_MAX_STREAM_SECONDS = float(os.getenv('SSE_MAX_STREAM_SECONDS', 600))
+SSE_RETRY_MILLISECONDS = 2000
 
 api_bp = Blueprint('api', __name__)
 
@@ -40,12 +59,16 @@ def token_required(f):
         if not token:
             return jsonify({'message': 'Authentication Token is missing!'}), 401
         
-        try:
-            data = jwt.decode(token, current_app.config['JWT_SECRET_KEY'], algorithms=["HS256"])
-            kwargs['current_user'] = data
-        except Exception as e:
-            return jsonify({'message': 'Token is invalid or expired!', 'error': str(e)}), 401
-            
+        # Polled routes send the same token over and over; verify it once
+        data = verified_token_cache.get(token)
+        if data is None:
+            try:
+                data = jwt.decode(token, current_app.config['JWT_SECRET_KEY'], algorithms=["HS256"])
+            except Exception as e:
+                return jsonify({'message': 'Token is invalid or expired!', 'error': str(e)}), 401
+            verified_token_cache.put(token, data)
+        kwargs['current_user'] = data
+
         return f(*args, **kwargs)
     return decorated
 
@@ -79,43 +102,73 @@ def is_valid_date(date_str):
 @api_bp.route('/s3-upload', methods=['POST'])
 @token_required
 def s3_upload(current_user):
+    """
+    Stream an uploaded video into S3 while the request body arrives, as a
+    multipart upload with parts sent in parallel (see S3MultipartWriter). The
+    form fields have to come before the 'video' file in the body.
+    """
     if current_user['role'] != 's3_uploader':
         return jsonify({'success': False, 'error': 'Unauthorized'}), 403
 
-    if 'video' not in request.files:
+    boundary = request.mimetype_params.get('boundary')
+    if request.mimetype != 'multipart/form-data' or not boundary:
         return jsonify({'success': False, 'error': 'No video file found in request'}), 400
 
-    file = request.files['video']
-    upload_date = request.form.get('upload_date')
-    camera_angle = request.form.get('camera_angle')
-    video_type = request.form.get('video_type')
-    user_name = request.form.get('user_name')
-
-    if not all([file, upload_date, camera_angle, video_type, user_name]):
-        return jsonify({'success': False, 'error': 'Missing form data for S3 upload'}), 400
-    if not is_valid_date(upload_date):
-        return jsonify({'success': False, 'error': 'Invalid upload date format.'}), 400
-    
-    date_obj = datetime.datetime.strptime(upload_date, "%Y-%m-%d")
-    upload_date_str = date_obj.strftime("%d-%m-%Y")
-    
-    # MODIFIED: The folder path now prepends the base folder from the config
-    base_folder = current_app.config['S3_UPLOAD_FOLDER']
-    folder_path = os.path.join(
-        base_folder,
-        upload_date_str,
-        user_name,
-        'Raw-videos',
-        camera_angle,
-        video_type
-    ).replace("\\", "/")
-
-    success, message, s3_key = upload_file_to_s3(
-        file,
-        bucket_name=current_app.config['S3_BUCKET'],
-        folder_path=folder_path
-    )
-    return jsonify({'success': success, 'message': message, 's3_key': s3_key})
+    form = {}
+    writer = None
+    # True while the body is inside the file part that opened the writer
+    receiving_video = False
+    try:
+        for kind, name, value in iter_form_data(request.stream, boundary.encode('latin-1')):
+            if kind == 'field':
+                form[name] = value
+            elif kind == 'file':
+                receiving_video = False
+                if name != 'video':
+                    continue
+                if writer is not None:
+                    writer.abort()
+                    return jsonify({'success': False, 'error': 'Only one video can be uploaded per request'}), 400
+
+                filename, content_type = value
+                if not filename or not all(form.get(field) for field in UPLOAD_FORM_FIELDS):
+                    return jsonify({'success': False, 'error': 'Missing form data for S3 upload'}), 400
+                if not is_valid_date(form['upload_date']):
+                    return jsonify({'success': False, 'error': 'Invalid upload date format.'}), 400
+
+                date_obj = datetime.datetime.strptime(form['upload_date'], "%Y-%m-%d")
+                upload_date_str = date_obj.strftime("%d-%m-%Y")
+                # MODIFIED: The folder path now prepends the base folder from the config
+                base_folder = current_app.config['S3_UPLOAD_FOLDER']
+                folder_path = raw_video_folder(
+                    base_folder, upload_date_str, form['user_name'], form['camera_angle'], form['video_type']
+                )
+                s3_key = os.path.join(folder_path, secure_filename(filename)).replace("\\", "/")
+                current_app.logger.info(f"Streaming upload to S3 key: {s3_key}")
+                writer = S3MultipartWriter(current_app.config['S3_BUCKET'], s3_key, content_type=content_type)
+                receiving_video = True
+            elif kind == 'data' and receiving_video:
+                writer.write(value)
+
+        if writer is None:
+            return jsonify({'success': False, 'error': 'No video file found in request'}), 400
+        writer.complete()
+    except Exception as e:
+        if writer is not None:
+            writer.abort()
+        current_app.logger.error(f"Error during S3 upload: {e}")
+        if isinstance(e, ClientError):
+            message = f"S3 error: {e.response['Error']['Message']}"
+        else:
+            message = f"Error: {e}"
+        return jsonify({'success': False, 'message': message, 's3_key': None})
+
+    # The folder listing changed; the next retrieval has to go to S3
+    video_index.invalidate(folder_path)
+    if is_raw_video_key(s3_key):
+        record_video_upload(writer.size)
+    message = f"File {secure_filename(filename)} uploaded successfully."
+    return jsonify({'success': True, 'message': message, 's3_key': s3_key})
 
 @api_bp.route('/s3-upload-status', methods=['POST'])
 @token_required
@@ -174,14 +227,7 @@ def retrieve_s3_videos(current_user):
 
     # MODIFIED: The retrieval path is now consistent with the upload path
     base_folder = current_app.config['S3_UPLOAD_FOLDER']
-    s3_prefix = os.path.join(
-        base_folder,
-        formatted_date,
-        client_id,
-        'Raw-videos',
-        camera_angle,
-        video_type
-    ).replace("\\", "/") + "/"
+    s3_prefix = raw_video_folder(base_folder, formatted_date, client_id, camera_angle, video_type) + "/"
 
     success, folders = list_videos_in_folder(
         bucket_name=current_app.config['S3_BUCKET'],
@@ -193,6 +239,70 @@ def retrieve_s3_videos(current_user):
     
     return jsonify({'success': True, 'folders': folders})
 
+@api_bp.route('/gallery', methods=['POST'])
+@token_required
+def get_gallery(current_user):
+    """
+    Paginated wagon frames of a processed folder, read from the per-video
+    manifests, with thumbnail and full-size URLs for the requested page only.
+    """
+    data = request.get_json() or {}
+    retrieve_date = data.get('retrieve_date')
+    client_id = data.get('client_id')
+    camera_angle = data.get('camera_angle')
+    video_type = data.get('video_type')
+
+    if not all([retrieve_date, client_id, camera_angle, video_type]):
+        return jsonify({'success': False, 'error': 'Missing criteria for gallery retrieval'}), 400
+
+    try:
+        formatted_date = datetime.datetime.strptime(retrieve_date, "%Y-%m-%d").strftime("%d-%m-%Y")
+        page = max(1, int(data.get('page', 1)))
+        page_size = min(GALLERY_MAX_PAGE_SIZE, max(1, int(data.get('page_size', GALLERY_DEFAULT_PAGE_SIZE))))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'Invalid date or pagination parameters.'}), 400
+
+    bucket_name = current_app.config['S3_BUCKET']
+    folder = processed_frames_folder(
+        current_app.config['S3_UPLOAD_FOLDER'], formatted_date, client_id, camera_angle, video_type
+    )
+    try:
+        manifests = list_video_manifests(bucket_name, folder)
+    except Exception as e:
+        current_app.logger.error(f"Error listing gallery of {folder}: {str(e)}")
+        return jsonify({'success': False, 'error': 'Failed to read the processed folder.'}), 500
+
+    video_filter = data.get('video')
+    frames = [
+        (video_name, frame)
+        for video_name, manifest in manifests if not video_filter or video_name == video_filter
+        for frame in manifest.get('frames', [])
+    ]
+    start = (page - 1) * page_size
+    items = []
+    for video_name, frame in frames[start:start + page_size]:
+        full_url = generate_presigned_url(bucket_name, frame['key'])
+        thumbnail_url = generate_presigned_url(bucket_name, frame['thumbnail']) if frame.get('thumbnail') else None
+        items.append({
+            'video': video_name,
+            'frame_index': frame.get('frame_idx'),
+            'box': frame.get('box'),
+            'thumbnail_url': thumbnail_url or full_url,
+            'url': full_url,
+        })
+
+    return jsonify({
+        'success': True,
+        'page': page,
+        'page_size': page_size,
+        'total': len(frames),
+        'videos': [
+            {'name': video_name, 'status': manifest.get('status'), 'count': len(manifest.get('frames', []))}
+            for video_name, manifest in manifests
+        ],
+        'frames': items,
+    })
+
 @api_bp.route('/process-s3-videos', methods=['POST'])
 @token_required
 def process_s3_videos(current_user):
@@ -209,11 +319,10 @@ def process_s3_videos(current_user):
 
     return jsonify({'success': True, 'task_id': task.id}), 202
 
-@api_bp.route('/task-status/<task_id>', methods=['GET'])
-@token_required
-def task_status(current_user, task_id):
+def task_state(task_id, include_result=True):
+    """The state, status and progress of a task as stored in the result backend."""
     task = AsyncResult(task_id, app=process_s3_videos_task.app)
-    
+
     response = {'state': task.state}
     if task.state == 'PENDING':
         response.update({'status': 'Pending...', 'progress': 0})
@@ -221,10 +330,84 @@ def task_status(current_user, task_id):
         response.update(task.info or {})
         if task.state == 'SUCCESS':
             response['result'] = task.result
+        if not include_result:
+            # The frame URL list is only served by /task-status
+            response.pop('result', None)
     else:
         response.update({'status': str(task.info), 'error': True})
-        
-    return jsonify(response)
+    return response
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@api_bp.route('/task-status/<task_id>', methods=['GET'])
+@token_required
+def task_status(current_user, task_id):
+    return jsonify(task_state(task_id))
+
+@api_bp.route('/task-events/<task_id>', methods=['GET'])
+@token_required
+def task_events(current_user, task_id):
+    """
+    Server-Sent Events stream of a task's progress.
+
+    Sends a 'progress' event with the current state, then one per change
+    published by the workers, carrying only the fields that changed. An 'end'
+    event follows a terminal state; the client then fetches /task-status once
+    for the result. If Redis pub/sub is unavailable the client should keep
+    polling /task-status instead.
+    """
+    try:
+        pubsub = subscribe_task_events(task_id)
+    except redis.RedisError as e:
+        current_app.logger.warning(f"Progress stream of {task_id} unavailable: {e}")
+        return jsonify({'success': False, 'error': 'Progress stream unavailable.'}), 503
+
+    def stream():
+        sent = {}
+
+        def changed_fields(state):
+            changed = {key: value for key, value in state.items() if sent.get(key) != value}
+            sent.update(changed)
+            return changed
+
+        try:
+            yield f"retry: {SSE_RETRY_MILLISECONDS}\n\n"
+            # Subscribed first, so nothing published after this snapshot is missed
+            yield sse_event('progress', changed_fields(task_state(task_id, include_result=False)))
+
+            started = last_sent = time.monotonic()
+            while sent.get('state') not in TERMINAL_TASK_STATES:
+                if time.monotonic() - started > SSE_MAX_STREAM_SECONDS:
+                    return
+                message = pubsub.get_message(timeout=1.0)
+                if message is not None:
+                    changed = changed_fields(json.loads(message['data']))
+                elif time.monotonic() - last_sent >= SSE_KEEPALIVE_SECONDS:
+                    # Quiet channel: re-check the result backend in case an event was lost
+                    changed = changed_fields(task_state(task_id, include_result=False))
+                    if not changed:
+                        yield ": keep-alive\n\n"
+                        last_sent = time.monotonic()
+                        continue
+                else:
+                    continue
+                if changed:
+                    yield sse_event('progress', changed)
+                    last_sent = time.monotonic()
+
+            yield sse_event('end', {'state': sent['state']})
+        except redis.RedisError as e:
+            # Ends the stream without 'end'; the client reconnects or falls back to polling
+            current_app.logger.warning(f"Progress stream of {task_id} interrupted: {e}")
+        finally:
+            pubsub.close()
+
+    return Response(
+        stream_with_context(stream()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
 @api_bp.route('/task-cancel/<task_id>', methods=['POST'])
 @token_required
@@ -235,6 +418,10 @@ def cancel_task(current_user, task_id):
     try:
         # Revoke the task. terminate=True will try to kill the worker process.
         process_s3_videos_task.AsyncResult(task_id).revoke(terminate=True)
+        # A folder job fans out into per-video subtasks; stop those as well
+        for child_id in get_child_task_ids(task_id):
+            process_s3_videos_task.AsyncResult(child_id).revoke(terminate=True)
+        publish_task_event(task_id, 'REVOKED', status='Cancelled')
         return jsonify({'success': True, 'message': f'Task {task_id} cancellation request sent.'})
     except Exception as e:
         # Log the exception
@@ -245,16 +432,24 @@ def cancel_task(current_user, task_id):
 @token_required
 def get_system_status(current_user):
     try:
-        stats = get_s3_usage_stats(
-            bucket_name=current_app.config['S3_BUCKET'],
-            prefix=current_app.config['S3_UPLOAD_FOLDER']
-        )
+        stats = get_usage_stats()
+        if stats is None:
+            # First call (or Redis unavailable): seed the store with a full scan
+            stats = reconcile_usage_stats(
+                bucket_name=current_app.config['S3_BUCKET'],
+                prefix=current_app.config['S3_UPLOAD_FOLDER']
+            )
         
         return jsonify({
             "total_videos": stats.get('total_videos', 0),
             "storage_usage": format_bytes(stats.get('total_size_bytes', 0)),
             "total_detections": stats.get('total_detections', 0), 
-            "processing_speed": "Optimal"
+            "processing_speed": "Optimal",
+            "stats_updated_at": stats['updated_at'],
+            "stats_reconciled_at": stats['reconciled_at'],
+            "stats_age_seconds": round(time.time() - stats['reconciled_at'], 1),
+            # Of this API process, which presigns the /gallery and /get-video-url links
+            "presigned_url_cache": presigned_url_cache_stats()
         })
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -0,0 +1,48 @@
+"""
+Reports frames/sec of FrameExtractor.process_video_pipelined for several YOLO batch sizes.
+
+Usage (from the backend directory):
+    python -m benchmarks.benchmark_batch_inference --model models/best_weights.pt
+"""
+import argparse
+import os
+import tempfile
+
+from services.frame_extractor import FrameExtractor
+from benchmarks.local_pipeline import run_pipeline
+from benchmarks.synthetic_clip import count_frames, write_synthetic_clip
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default='models/best_weights.pt')
+    parser.add_argument('--video', help='Existing clip to use instead of a synthetic one.')
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--batch-sizes', default='1,8,16,32')
+    args = parser.parse_args()
+
+    extractor = FrameExtractor(model_path=args.model)
+    if extractor.model is None:
+        raise SystemExit(f"Model not found: {args.model}")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        video_path = args.video or write_synthetic_clip(os.path.join(tmp_dir, 'synthetic.mp4'), num_frames=args.frames)
+        num_frames = count_frames(video_path)
+
+        # Warm up so the first measured run does not pay for lazy initialisation
+        run_pipeline(extractor, video_path, batch_size=1)
+
+        baseline_frames = None
+        print(f"{'batch':>6} {'seconds':>9} {'frames/s':>9} {'captures':>9}  match")
+        for batch_size in [int(b) for b in args.batch_sizes.split(',')]:
+            frames, elapsed, _ = run_pipeline(extractor, video_path, batch_size=batch_size)
+
+            if baseline_frames is None:
+                baseline_frames = frames
+            match = frames == baseline_frames
+            print(f"{batch_size:>6} {elapsed:>9.2f} {num_frames / elapsed:>9.1f} {len(frames):>9}  "
+                  f"{'yes' if match else 'NO'}")
+
+
+if __name__ == '__main__':
+    main()
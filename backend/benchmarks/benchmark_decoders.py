@@ -0,0 +1,87 @@
+"""
+Decode-only throughput of the video decode backends.
+
+For every clip, reports frames/sec for OpenCV with several FFmpeg thread
+counts (and hardware acceleration if requested), PyAV with threaded codec
+contexts, and PyAV keyframe-only decoding at reduced resolution as used by
+keyframe scouting. No inference is run.
+
+Usage (from the backend directory):
+    python -m benchmarks.benchmark_decoders [--video clip.mp4 ...] [--threads 1,2,4,0] [--hw-acceleration any]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from services.decoders import iter_keyframes, open_video
+from services.frame_extractor import SCOUT_MAX_SIDE
+from benchmarks.synthetic_clip import write_synthetic_clip
+
+
+def decode_all(video_path, **kwargs):
+    cap = open_video(video_path, **kwargs)
+    if not cap.isOpened():
+        raise RuntimeError(f"Could not open {video_path} with {kwargs}")
+    frames = 0
+    start = time.perf_counter()
+    frame = None
+    while True:
+        # Reuse the previous buffer, like FramePool does
+        ret, frame = cap.read(frame)
+        if not ret:
+            break
+        frames += 1
+    cap.release()
+    return frames, time.perf_counter() - start
+
+
+def decode_keyframes(video_path, max_side):
+    frames = 0
+    start = time.perf_counter()
+    for _ in iter_keyframes(video_path, max_side=max_side):
+        frames += 1
+    return frames, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--video', action='append', help='Sample clip; may be given several times.')
+    parser.add_argument('--frames', type=int, default=600)
+    parser.add_argument('--threads', default='1,2,4,0', help='Decoder thread counts; 0 = library default')
+    parser.add_argument('--hw-acceleration', default='none', help='OpenCV hardware acceleration to also try')
+    parser.add_argument('--scout-max-side', type=int, default=SCOUT_MAX_SIDE)
+    args = parser.parse_args()
+    thread_counts = [int(threads) for threads in args.threads.split(',')]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        videos = args.video or [write_synthetic_clip(
+            os.path.join(tmp_dir, 'synthetic.mp4'), num_frames=args.frames, width=3840, height=2160
+        )]
+        for video_path in videos:
+            configs = [('opencv', {'backend': 'opencv', 'threads': threads}) for threads in thread_counts]
+            if args.hw_acceleration != 'none':
+                configs.append(('opencv', {'backend': 'opencv', 'hw_acceleration': args.hw_acceleration}))
+            configs += [('pyav', {'backend': 'pyav', 'threads': threads}) for threads in thread_counts]
+
+            print(f"\n{video_path}")
+            print(f"{'backend':<8} {'threads':>7} {'hw':>6} {'frames':>7} {'frames/s':>9}")
+            for label, kwargs in configs:
+                try:
+                    frames, seconds = decode_all(video_path, **kwargs)
+                except (ImportError, RuntimeError) as e:
+                    print(f"{label:<8} skipped: {e}")
+                    continue
+                print(f"{label:<8} {kwargs.get('threads', 0) or 'auto':>7} {kwargs.get('hw_acceleration', 'none'):>6} "
+                      f"{frames:>7} {frames / seconds:>9.1f}")
+
+            try:
+                frames, seconds = decode_keyframes(video_path, args.scout_max_side)
+                print(f"{'keyframes':<8} {'auto':>7} {'none':>6} {frames:>7} {frames / seconds:>9.1f}"
+                      f"  (PyAV, longest side {args.scout_max_side})")
+            except ImportError as e:
+                print(f"keyframes skipped: {e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Cost of the detection cache versus a detector pass.
+
+Records the detections of a clip once, then reports the size of the cached
+archive, how long loading it takes, and how long replaying the capture state
+machine takes for a grid of capture delays and confidence thresholds.
+
+Usage (from the backend directory):
+    python -m benchmarks.benchmark_detection_cache --model models/best_weights.pt [--video clip.mp4]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import cv2
+
+from services.detection_cache import VideoDetections
+from services.frame_extractor import FrameExtractor
+from services.wagon_capture import replay_wagon_captures
+from benchmarks.synthetic_clip import write_synthetic_clip
+
+
+def record_detections(extractor, video_path, batch_size):
+    detection_log = VideoDetections()
+    cap = cv2.VideoCapture(video_path)
+    batch = []
+    while True:
+        ret, frame = cap.read()
+        if ret:
+            batch.append(frame)
+        if batch and (not ret or len(batch) == batch_size):
+            extractor.detect_wagons(extractor.model, batch, detection_log=detection_log)
+            batch = []
+        if not ret:
+            break
+    cap.release()
+    return detection_log
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default='models/best_weights.pt')
+    parser.add_argument('--video')
+    parser.add_argument('--frames', type=int, default=600)
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--capture-delays', default='3,5,8')
+    parser.add_argument('--thresholds', default='0.6,0.7,0.8')
+    args = parser.parse_args()
+
+    extractor = FrameExtractor(model_path=args.model)
+    if extractor.model is None:
+        raise SystemExit(f"Model not found: {args.model}")
+    extractor.warm_up()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        video_path = args.video or write_synthetic_clip(os.path.join(tmp_dir, 'synthetic.mp4'), num_frames=args.frames)
+        start = time.perf_counter()
+        detection_log = record_detections(extractor, video_path, args.batch_size)
+        inference_seconds = time.perf_counter() - start
+
+    data = detection_log.to_bytes()
+    start = time.perf_counter()
+    cached = VideoDetections.from_bytes(data)
+    load_ms = (time.perf_counter() - start) * 1000
+
+    print(f"Frames:           {len(cached)}")
+    print(f"Decode+inference: {inference_seconds:.2f}s")
+    print(f"Cache archive:    {len(data) / 1024:.1f} KiB, loaded in {load_ms:.1f} ms")
+    print(f"{'delay':>6} {'threshold':>10} {'wagons':>7} {'replay ms':>10}")
+    for capture_delay in [int(delay) for delay in args.capture_delays.split(',')]:
+        for threshold in [float(value) for value in args.thresholds.split(',')]:
+            start = time.perf_counter()
+            captures = replay_wagon_captures(cached, confidence_threshold=threshold, capture_delay=capture_delay)
+            replay_ms = (time.perf_counter() - start) * 1000
+            print(f"{capture_delay:>6} {threshold:>10.2f} {len(captures):>7} {replay_ms:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
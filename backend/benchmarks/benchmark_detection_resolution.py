@@ -0,0 +1,77 @@
+"""
+Throughput / accuracy trade-off of reduced-resolution detection.
+
+For each detection size (longest frame side before detection) and inference
+image size, reports frames/sec of process_video_pipelined, how often the number
+of wagon boxes per frame agrees with full-resolution detection (what drives
+the capture state machine), and whether the captured wagons are identical.
+
+Usage (from the backend directory):
+    python -m benchmarks.benchmark_detection_resolution --model models/best_weights.pt [--video clip.mp4]
+"""
+import argparse
+import os
+import tempfile
+
+import cv2
+
+from services.frame_extractor import FrameExtractor
+from benchmarks.local_pipeline import run_pipeline
+from benchmarks.synthetic_clip import count_frames, write_synthetic_clip
+
+
+def wagon_counts(extractor, video_path, batch_size=8):
+    cap = cv2.VideoCapture(video_path)
+    counts = []
+    batch = []
+    while True:
+        ret, frame = cap.read()
+        if ret:
+            batch.append(frame)
+        if batch and (not ret or len(batch) == batch_size):
+            counts.extend(len(boxes) for boxes in extractor.detect_wagons(extractor.model, batch))
+            batch = []
+        if not ret:
+            break
+    cap.release()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default='models/best_weights.pt')
+    parser.add_argument('--video')
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--max-sides', default='0,1280,960,640', help='0 = full resolution')
+    parser.add_argument('--image-sizes', default='0,480,320', help="0 = the model's own size")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        video_path = args.video or write_synthetic_clip(
+            os.path.join(tmp_dir, 'synthetic.mp4'), num_frames=args.frames, width=3840, height=2160
+        )
+        num_frames = count_frames(video_path)
+
+        reference_counts = reference_frames = None
+        print(f"{'max side':>8} {'imgsz':>6} {'frames/s':>9} {'count agreement':>16} {'captures':>9} {'same':>5}")
+        for image_size in [int(size) for size in args.image_sizes.split(',')]:
+            for max_side in [int(side) for side in args.max_sides.split(',')]:
+                extractor = FrameExtractor(
+                    model_path=args.model, image_size=image_size or None, detection_max_side=max_side
+                )
+                extractor.warm_up()
+
+                frames, seconds, _ = run_pipeline(extractor, video_path)
+                fps = num_frames / seconds
+                counts = wagon_counts(extractor, video_path)
+
+                if reference_counts is None:
+                    reference_counts, reference_frames = counts, frames
+                agreement = sum(a == b for a, b in zip(counts, reference_counts)) / max(1, len(reference_counts))
+                same = frames == reference_frames
+                print(f"{max_side or 'full':>8} {image_size or 'model':>6} {fps:>9.1f} {agreement:>16.1%} "
+                      f"{len(frames):>9} {'yes' if same else 'no':>5}")
+
+
+if __name__ == '__main__':
+    main()
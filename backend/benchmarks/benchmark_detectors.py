@@ -0,0 +1,114 @@
+"""
+Compares detector backends: frames/sec per backend and parity of boxes and
+classes against the Ultralytics (PyTorch) reference.
+
+Exits with status 1 if a backend's detections do not match within tolerance.
+
+Usage (from the backend directory):
+    python -m benchmarks.benchmark_detectors --model models/best_weights.pt --export [--int8] [--video clip.mp4]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+
+from services.detectors import OnnxDetector, UltralyticsDetector, export_onnx, onnx_path_for
+from services.frame_extractor import CONFIDENCE_THRESHOLD
+from benchmarks.synthetic_clip import write_synthetic_clip
+
+
+def read_frames(video_path, limit):
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    while len(frames) < limit:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def iou(a, b):
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def matches(reference, candidate, min_iou, max_conf_delta):
+    """Every reference box has a same-class candidate box with IoU >= min_iou, and vice versa."""
+    if len(reference) != len(candidate):
+        return False
+    unmatched = list(candidate)
+    for ref in reference:
+        best = max(
+            (c for c in unmatched if int(c[5]) == int(ref[5])),
+            key=lambda c: iou(ref, c),
+            default=None,
+        )
+        if best is None or iou(ref, best) < min_iou or abs(best[4] - ref[4]) > max_conf_delta:
+            return False
+        unmatched = [c for c in unmatched if c is not best]
+    return True
+
+
+def run(detector, frames, batch_size):
+    outputs = []
+    start = time.perf_counter()
+    for i in range(0, len(frames), batch_size):
+        outputs.extend(detector.detect(frames[i:i + batch_size], CONFIDENCE_THRESHOLD))
+    return outputs, len(frames) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default='models/best_weights.pt')
+    parser.add_argument('--onnx', help='ONNX model (default: next to --model)')
+    parser.add_argument('--export', action='store_true', help='Export the ONNX model first')
+    parser.add_argument('--int8', action='store_true', help='Also export and compare an INT8 model')
+    parser.add_argument('--video')
+    parser.add_argument('--frames', type=int, default=200)
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--threads', type=int, default=0, help='onnxruntime intra-op threads')
+    parser.add_argument('--min-iou', type=float, default=0.9)
+    parser.add_argument('--max-conf-delta', type=float, default=0.05)
+    args = parser.parse_args()
+
+    onnx_path = args.onnx or onnx_path_for(args.model)
+    backends = [('ultralytics', lambda: UltralyticsDetector(args.model))]
+    if args.export:
+        export_onnx(args.model, onnx_path)
+    backends.append(('onnx', lambda: OnnxDetector(onnx_path, intra_op_threads=args.threads)))
+    if args.int8:
+        int8_path = export_onnx(args.model, onnx_path, int8=True)
+        backends.append(('onnx-int8', lambda: OnnxDetector(int8_path, intra_op_threads=args.threads)))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        video_path = args.video or write_synthetic_clip(os.path.join(tmp_dir, 'synthetic.mp4'), num_frames=args.frames)
+        frames = read_frames(video_path, args.frames)
+
+    reference = None
+    all_match = True
+    print(f"{'backend':>12} {'frames/s':>9} {'parity':>9}")
+    for name, make_detector in backends:
+        detector = make_detector()
+        detector.detect(frames[:1], CONFIDENCE_THRESHOLD)  # warm-up
+        outputs, fps = run(detector, frames, args.batch_size)
+        if reference is None:
+            reference = outputs
+        matched = sum(
+            matches(ref, out, args.min_iou, args.max_conf_delta) for ref, out in zip(reference, outputs)
+        )
+        all_match = all_match and matched == len(frames)
+        print(f"{name:>12} {fps:>9.1f} {matched:>4}/{len(frames):<4}")
+
+    sys.exit(0 if all_match else 1)
+
+
+if __name__ == '__main__':
+    main()
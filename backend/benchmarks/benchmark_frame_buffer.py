@@ -0,0 +1,137 @@
+"""
+Compares the old deque-of-copies capture buffer with the FramePool ring on
+decode + capture only (detections are scripted, no model is needed).
+
+Each variant runs in its own subprocess so peak RSS is measured separately.
+Exits with status 1, before printing any timings, if the variants capture a
+different number of wagons.
+
+Usage (from the backend directory):
+    python -m benchmarks.benchmark_frame_buffer [--video clip.mp4] [--width 3840 --height 2160]
+"""
+import argparse
+import collections
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import cv2
+
+from services.frame_extractor import FRAME_BUFFER_SIZE, WagonCaptureTracker, read_frame_batches
+from services.frame_pool import FramePool
+from benchmarks.synthetic_clip import write_synthetic_clip
+
+
+def scripted_boxes(frame_idx):
+    """One wagon for 60 frames, then 20 frames of empty track."""
+    return [[0, 0, 1, 1]] if frame_idx % 80 < 60 else []
+
+
+def run_deque_copies(video_path, batch_size):
+    """The capture buffer as it was before FramePool: every frame copied into a deque."""
+    cap = cv2.VideoCapture(video_path)
+    frame_buffer = collections.deque(maxlen=FRAME_BUFFER_SIZE)
+    state = "SEARCHING_FOR_WAGON"
+    potential = None
+    saved = 0
+    frame_idx = 0
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frame_idx += 1
+        boxes = scripted_boxes(frame_idx)
+        frame_buffer.append((frame.copy(), boxes))
+        if len(frame_buffer) == FRAME_BUFFER_SIZE:
+            oldest_frame, oldest_boxes = frame_buffer[0]
+            if state == "SEARCHING_FOR_WAGON":
+                if len(boxes) == 1:
+                    state = "SINGLE_WAGON_PASSING"
+                    potential = None
+            elif len(boxes) == 1:
+                if len(oldest_boxes) == 1:
+                    potential = oldest_frame.copy()
+            else:
+                saved += potential is not None
+                potential = None
+                state = "SEARCHING_FOR_WAGON"
+    # The wagon still passing when the video ends
+    if state == "SINGLE_WAGON_PASSING" and potential is not None:
+        saved += 1
+    cap.release()
+    return frame_idx, saved
+
+
+def run_frame_pool(video_path, batch_size):
+    cap = cv2.VideoCapture(video_path)
+    pool = FramePool(FRAME_BUFFER_SIZE + 1 + batch_size)
+    tracker = WagonCaptureTracker(pool=pool)
+    saved = 0
+    frame_idx = 0
+    for batch_slots in read_frame_batches(cap, batch_size, pool):
+        for slot in batch_slots:
+            frame_idx += 1
+            captured = tracker.update(slot, scripted_boxes(frame_idx), frame_idx=frame_idx)
+            if captured is not None:
+                saved += 1
+                pool.release(captured.frame)
+    captured = tracker.finish()
+    if captured is not None:
+        saved += 1
+        pool.release(captured.frame)
+    cap.release()
+    return frame_idx, saved
+
+
+VARIANTS = {'deque': run_deque_copies, 'pool': run_frame_pool}
+
+
+def run_variant(name, video_path, batch_size):
+    start = time.perf_counter()
+    frames, saved = VARIANTS[name](video_path, batch_size)
+    elapsed = time.perf_counter() - start
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+    print(f"{name:>6} {frames / elapsed:>9.1f} {peak_rss_mb:>12.1f} {saved:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--video')
+    parser.add_argument('--frames', type=int, default=400)
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--variant', choices=sorted(VARIANTS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        run_variant(args.variant, args.video, args.batch_size)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        video_path = args.video or write_synthetic_clip(
+            os.path.join(tmp_dir, 'synthetic.mp4'), num_frames=args.frames, width=args.width, height=args.height
+        )
+        rows = [
+            subprocess.run(
+                [sys.executable, '-m', 'benchmarks.benchmark_frame_buffer', '--variant', name,
+                 '--video', video_path, '--batch-size', str(args.batch_size)],
+                check=True, stdout=subprocess.PIPE, text=True,
+            ).stdout.rstrip('\n')
+            for name in ('deque', 'pool')
+        ]
+
+    captures = {row.split()[0]: int(row.split()[-1]) for row in rows}
+    if len(set(captures.values())) != 1:
+        print(f"Variants capture different wagons: {captures}")
+        sys.exit(1)
+    print(f"{'buffer':>6} {'frames/s':>9} {'peak RSS MB':>12} {'captures':>9}")
+    for row in rows:
+        print(row)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Encode throughput and output size of captured frames per format and quality,
+encoded one at a time (the old behaviour) versus on the FrameEncoder pool.
+
+Usage (from the backend directory):
+    python -m benchmarks.benchmark_frame_encoder [--video clip.mp4] [--frames 64] [--workers 4]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import cv2
+
+from services.frame_encoder import FrameEncoder
+from benchmarks.synthetic_clip import write_synthetic_clip
+
+
+def read_frames(video_path, count):
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    while len(frames) < count:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--video')
+    parser.add_argument('--frames', type=int, default=64)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--thumbnail-max-side', type=int, default=320)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        video_path = args.video or write_synthetic_clip(
+            os.path.join(tmp_dir, 'synthetic.mp4'), num_frames=args.frames, width=3840, height=2160
+        )
+        frames = read_frames(video_path, args.frames)
+    if not frames:
+        raise SystemExit("No frames decoded")
+
+    start = time.perf_counter()
+    baseline_bytes = sum(len(cv2.imencode('.jpg', frame)[1]) for frame in frames)
+    baseline_seconds = time.perf_counter() - start
+    print(f"{len(frames)} frames of {frames[0].shape[1]}x{frames[0].shape[0]}")
+    print(f"{'config':<24} {'frames/s':>9} {'avg KiB':>8} {'thumb KiB':>10}")
+    print(f"{'cv2.imencode serial':<24} {len(frames) / baseline_seconds:>9.1f} "
+          f"{baseline_bytes / len(frames) / 1024:>8.1f} {'-':>10}")
+
+    for image_format, quality in (('jpeg', 95), ('jpeg', 85), ('jpeg', 75), ('webp', 80)):
+        encoder = FrameEncoder(image_format=image_format, quality=quality,
+                               thumbnail_max_side=args.thumbnail_max_side, max_workers=args.workers)
+        start = time.perf_counter()
+        results = list(encoder.iter_encode(enumerate(frames)))
+        seconds = time.perf_counter() - start
+        image_kib = sum(len(image) for _, image, _ in results) / len(results) / 1024
+        thumbnail_kib = sum(len(thumbnail or b'') for _, _, thumbnail in results) / len(results) / 1024
+        label = f"{image_format} q{quality} x{args.workers}"
+        print(f"{label:<24} {len(frames) / seconds:>9.1f} {image_kib:>8.1f} {thumbnail_kib:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""
+Reports task startup latency (model ready to process the first frame) when a
+new FrameExtractor is built per task, versus the cached get_frame_extractor().
+
+Usage (from the backend directory):
+    python -m benchmarks.benchmark_model_cache --model models/best_weights.pt [--tasks 5]
+"""
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from services.frame_extractor import FrameExtractor, get_frame_extractor
+
+
+def first_inference(extractor):
+    extractor.detect_wagons(extractor.model, [np.zeros((720, 1280, 3), dtype=np.uint8)])
+
+
+def per_task_extractor(model_path):
+    first_inference(FrameExtractor(model_path=model_path))
+
+
+def cached_extractor(model_path):
+    first_inference(get_frame_extractor(model_path=model_path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default='models/best_weights.pt')
+    parser.add_argument('--tasks', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'variant':>22} {'first task s':>13} {'later tasks s':>14}")
+    for name, start_task in (('new extractor per task', per_task_extractor), ('cached extractor', cached_extractor)):
+        latencies = []
+        for _ in range(args.tasks):
+            start = time.perf_counter()
+            start_task(args.model)
+            latencies.append(time.perf_counter() - start)
+        later = statistics.mean(latencies[1:]) if len(latencies) > 1 else float('nan')
+        print(f"{name:>22} {latencies[0]:>13.3f} {later:>14.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Checks that motion gating captures the same wagons as full inference, and
+that gating gives the same captures at the batch size used in production as
+frame by frame, and reports how many detector passes it saves.
+
+Exits with status 1 if any clip captures a different set of wagons.
+
+Usage (from the backend directory):
+    python -m benchmarks.benchmark_motion_gate --model models/best_weights.pt [--video clip.mp4 ...]
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+from services.frame_extractor import DEFAULT_BATCH_SIZE, FrameExtractor
+from services.motion_gate import MotionGate
+from benchmarks.local_pipeline import run_pipeline
+from benchmarks.synthetic_clip import write_synthetic_clip
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default='models/best_weights.pt')
+    parser.add_argument('--video', action='append', help='Fixture clip; may be given several times.')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    extractor = FrameExtractor(model_path=args.model)
+    if extractor.model is None:
+        raise SystemExit(f"Model not found: {args.model}")
+
+    all_match = True
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        videos = args.video or [write_synthetic_clip(os.path.join(tmp_dir, 'synthetic.mp4'), num_frames=600)]
+        for video_path in videos:
+            full_frames, full_seconds, _ = run_pipeline(extractor, video_path, batch_size=args.batch_size)
+
+            gate = MotionGate()
+            gated_frames, gated_seconds, _ = run_pipeline(
+                extractor, video_path, batch_size=args.batch_size, motion_gate=gate
+            )
+
+            # Gate decisions must not depend on how frames are batched
+            unbatched_frames, _, _ = run_pipeline(extractor, video_path, batch_size=1, motion_gate=MotionGate())
+
+            match = full_frames == gated_frames
+            batch_match = unbatched_frames == gated_frames
+            all_match = all_match and match and batch_match
+            report = gate.report()
+            print(f"{os.path.basename(video_path)}: captures {len(full_frames)} -> {len(gated_frames)} "
+                  f"({'match' if match else 'MISMATCH'}), batch size {args.batch_size} vs 1: "
+                  f"{len(gated_frames)} vs {len(unbatched_frames)} ({'match' if batch_match else 'MISMATCH'}), "
+                  f"inferences {report['inferences']}/{report['frames']} ({report['discarded']} discarded) "
+                  f"(saved {report['skipped_ratio']:.0%}), {full_seconds:.2f}s -> {gated_seconds:.2f}s")
+
+    sys.exit(0 if all_match else 1)
+
+
+if __name__ == '__main__':
+    main()
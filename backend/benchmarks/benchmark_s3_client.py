@@ -0,0 +1,58 @@
+"""
+Measures per-upload latency with a new S3 client per call (the old behaviour)
+versus the shared, pooled client returned by get_s3_client().
+
+Uploads small objects under a scratch prefix and deletes them afterwards.
+
+Usage (from the backend directory, with AWS credentials in the environment):
+    python -m benchmarks.benchmark_s3_client --bucket my-bucket [--uploads 50]
+"""
+import argparse
+import statistics
+import time
+import uuid
+
+from services.s3_utils import get_s3_client, new_s3_client
+
+
+def upload_all(bucket, keys, payload, client_factory):
+    latencies = []
+    for key in keys:
+        start = time.perf_counter()
+        client_factory().put_object(Bucket=bucket, Key=key, Body=payload, ContentType='image/jpeg')
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bucket', required=True)
+    parser.add_argument('--prefix', default='benchmarks/s3-client')
+    parser.add_argument('--uploads', type=int, default=50)
+    parser.add_argument('--size-kb', type=int, default=200)
+    args = parser.parse_args()
+
+    payload = b'\0' * (args.size_kb * 1024)
+    run_prefix = f"{args.prefix.rstrip('/')}/{uuid.uuid4().hex}"
+    variants = (('new client per call', new_s3_client), ('shared client', get_s3_client))
+
+    written = []
+    print(f"{'variant':>20} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9}")
+    for name, client_factory in variants:
+        keys = [f"{run_prefix}/{name.replace(' ', '-')}/{i}.jpg" for i in range(args.uploads)]
+        latencies = sorted(upload_all(args.bucket, keys, payload, client_factory))
+        written.extend(keys)
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        print(f"{name:>20} {statistics.mean(latencies) * 1000:>9.1f} "
+              f"{statistics.median(latencies) * 1000:>9.1f} {p95 * 1000:>9.1f}")
+
+    client = get_s3_client()
+    for i in range(0, len(written), 1000):
+        client.delete_objects(
+            Bucket=args.bucket,
+            Delete={'Objects': [{'Key': key} for key in written[i:i + 1000]]},
+        )
+
+
+if __name__ == '__main__':
+    main()
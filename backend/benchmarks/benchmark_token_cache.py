@@ -0,0 +1,106 @@
+"""
+Per-request overhead of token_required on a polled route, verifying the JWT
+on every request (the old behaviour) versus the verified token cache.
+
+Requests go through the Flask test client to a route that only returns the
+caller's claims, so the numbers are the framework plus authentication cost,
+without Redis or Celery. The two variants run in alternating rounds and the
+median round is reported, so drift in machine speed hits both equally.
+
+Usage (from the backend directory):
+    python -m benchmarks.benchmark_token_cache [--requests 5000] [--rounds 5] [--clients 50]
+"""
+import argparse
+import datetime
+import statistics
+import time
+
+import jwt
+from flask import Flask, jsonify
+
+from api.routes import token_required
+from config import Config
+from services.token_cache import verified_token_cache
+
+
+def create_bench_app():
+    app = Flask(__name__)
+    app.config.from_object(Config)
+
+    @app.route('/poll')
+    @token_required
+    def poll(current_user):
+        return jsonify({'state': 'PROGRESS', 'user': current_user['username']})
+
+    return app
+
+
+def issue_tokens(count):
+    expires = datetime.datetime.utcnow() + Config.JWT_ACCESS_TOKEN_EXPIRES
+    return [
+        jwt.encode({'username': f"user{i}", 'role': 'standard', 'exp': expires}, Config.JWT_SECRET_KEY,
+                   algorithm="HS256")
+        for i in range(count)
+    ]
+
+
+def poll_all(client, tokens, requests, cached):
+    latencies = []
+    verified_token_cache.clear()
+    for i in range(requests):
+        if not cached:
+            verified_token_cache.clear()
+        headers = {'Authorization': f"Bearer {tokens[i % len(tokens)]}"}
+        start = time.perf_counter()
+        response = client.get('/poll', headers=headers)
+        latencies.append(time.perf_counter() - start)
+        if response.status_code != 200:
+            raise RuntimeError(f"Unexpected status {response.status_code}")
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=5000, help='Requests per variant and round')
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--clients', type=int, default=50, help='Distinct tokens polling in turn')
+    args = parser.parse_args()
+
+    client = create_bench_app().test_client()
+    tokens = issue_tokens(args.clients)
+    # Warm up imports and the routing map
+    poll_all(client, tokens, 100, cached=True)
+
+    variants = (('verify each', False), ('token cache', True))
+    rounds = {name: [] for name, _ in variants}
+    for i in range(args.rounds):
+        # Alternate which variant goes first
+        for name, cached in (variants if i % 2 == 0 else variants[::-1]):
+            rounds[name].append(sorted(poll_all(client, tokens, args.requests, cached)))
+
+    print(f"{'variant':>16} {'req/s':>9} {'mean us':>9} {'p50 us':>9} {'p95 us':>9}  (median of {args.rounds} rounds)")
+    means = {}
+    for name, _ in variants:
+        latencies = sorted(rounds[name], key=statistics.mean)[len(rounds[name]) // 2]
+        means[name] = statistics.mean(latencies)
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        print(f"{name:>16} {len(latencies) / sum(latencies):>9.0f} {means[name] * 1e6:>9.1f} "
+              f"{statistics.median(latencies) * 1e6:>9.1f} {p95 * 1e6:>9.1f}")
+    saved = means['verify each'] - means['token cache']
+    print(f"saved {saved * 1e6:.1f} us per request ({saved / means['verify each']:.1%})")
+
+    token = tokens[0]
+    calls = 20000
+    start = time.perf_counter()
+    for _ in range(calls):
+        jwt.decode(token, Config.JWT_SECRET_KEY, algorithms=["HS256"])
+    decode_us = (time.perf_counter() - start) / calls * 1e6
+    start = time.perf_counter()
+    for _ in range(calls):
+        verified_token_cache.get(token)
+    lookup_us = (time.perf_counter() - start) / calls * 1e6
+    print(f"jwt.decode {decode_us:.1f} us, cache lookup {lookup_us:.1f} us")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Runs clips through FrameExtractor.process_video_pipelined, the code path the
+workers use, against an in-process moto S3 bucket so benchmarks need no AWS
+account. Requires the packages in requirements-dev.txt.
+"""
+import contextlib
+import os
+import re
+import time
+from unittest import mock
+
+import boto3
+from moto import mock_s3
+
+from services.s3_utils import reset_s3_clients
+
+BUCKET = 'benchmark-bucket'
+OUTPUT_PREFIX = 'benchmark/frames'
+FRAME_KEY_PATTERN = re.compile(re.escape(OUTPUT_PREFIX) + r'/frame_(\d+)\.\w+$')
+
+
+@contextlib.contextmanager
+def local_s3():
+    """An empty moto bucket; the process-wide S3 client is rebuilt against it."""
+    credentials = {'AWS_ACCESS_KEY_ID': 'benchmark', 'AWS_SECRET_ACCESS_KEY': 'benchmark', 'AWS_REGION': 'us-east-1'}
+    with mock.patch.dict(os.environ, credentials), mock_s3():
+        reset_s3_clients()
+        boto3.client('s3', region_name='us-east-1').create_bucket(Bucket=BUCKET)
+        try:
+            yield BUCKET
+        finally:
+            reset_s3_clients()
+
+
+def captured_frames(bucket_name):
+    """The uploaded wagon frames (encoded bytes, thumbnails excluded) in capture order."""
+    s3_client = boto3.client('s3', region_name='us-east-1')
+    frames = []
+    for page in s3_client.get_paginator('list_objects_v2').paginate(Bucket=bucket_name, Prefix=OUTPUT_PREFIX):
+        for obj in page.get('Contents', []):
+            match = FRAME_KEY_PATTERN.match(obj['Key'])
+            if match:
+                frames.append((int(match.group(1)), obj['Key']))
+    return [s3_client.get_object(Bucket=bucket_name, Key=key)['Body'].read() for _, key in sorted(frames)]
+
+
+def run_pipeline(extractor, video_path, **kwargs):
+    """
+    Process a local clip with ``extractor.process_video_pipelined(**kwargs)``.
+
+    Returns the captured frames (see captured_frames), the seconds spent in
+    the pipeline and its per-stage stats.
+    """
+    with local_s3() as bucket_name:
+        start = time.perf_counter()
+        _, stage_stats = extractor.process_video_pipelined(video_path, bucket_name, OUTPUT_PREFIX, **kwargs)
+        seconds = time.perf_counter() - start
+        frames = captured_frames(bucket_name)
+    return frames, seconds, stage_stats
@@ -0,0 +1,97 @@
+"""
+Replays recorded detection traces through the wagon capture state machine
+for a grid of capture settings, in parallel across processes.
+
+Traces are detection cache archives (VideoDetections .npz), given as local
+paths or s3://bucket/key URIs, e.g. from the detection-cache/ prefix. For
+every configuration the number of captured wagons per trace and in total is
+reported with the replay time; no decoding or inference is involved.
+
+Usage (from the backend directory):
+    python -m benchmarks.replay_captures trace1.npz s3://bucket/detection-cache/<model>/<etag>.npz \\
+        --capture-delays 3,5,8 --thresholds 0.6,0.7 [--workers 4] [--json sweep.json]
+"""
+import argparse
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from services.detection_cache import VideoDetections
+from services.s3_utils import get_s3_client
+from services.wagon_capture import CAPTURE_DELAY, CONFIDENCE_THRESHOLD, WAGON_CLASS_ID, replay_wagon_captures
+
+# Traces loaded once per worker process
+_traces = {}
+
+
+def read_trace(location):
+    if location.startswith('s3://'):
+        bucket_name, _, s3_key = location[len('s3://'):].partition('/')
+        return get_s3_client().get_object(Bucket=bucket_name, Key=s3_key)['Body'].read()
+    with open(location, 'rb') as trace_file:
+        return trace_file.read()
+
+
+def _load_traces(trace_bytes):
+    _traces.clear()
+    for name, data in trace_bytes.items():
+        _traces[name] = VideoDetections.from_bytes(data)
+
+
+def replay_config(config):
+    capture_delay, confidence_threshold, wagon_class_id = config
+    captures = {}
+    start = time.perf_counter()
+    for name, detections in _traces.items():
+        captures[name] = len(replay_wagon_captures(
+            detections, confidence_threshold=confidence_threshold, capture_delay=capture_delay,
+            wagon_class_id=wagon_class_id
+        ))
+    return {
+        'capture_delay': capture_delay,
+        'confidence_threshold': confidence_threshold,
+        'wagon_class_id': wagon_class_id,
+        'captures': captures,
+        'total_captures': sum(captures.values()),
+        'replay_ms': round((time.perf_counter() - start) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('traces', nargs='+', help='VideoDetections archives (paths or s3:// URIs)')
+    parser.add_argument('--capture-delays', default=str(CAPTURE_DELAY))
+    parser.add_argument('--thresholds', default=str(CONFIDENCE_THRESHOLD))
+    parser.add_argument('--class-ids', default=str(WAGON_CLASS_ID))
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--json', help='Also write the results to this file')
+    args = parser.parse_args()
+
+    trace_bytes = {location: read_trace(location) for location in args.traces}
+    configs = list(itertools.product(
+        [int(delay) for delay in args.capture_delays.split(',')],
+        [float(threshold) for threshold in args.thresholds.split(',')],
+        [int(class_id) for class_id in args.class_ids.split(',')],
+    ))
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_load_traces, initargs=(trace_bytes,)) as executor:
+        results = list(executor.map(replay_config, configs))
+    elapsed = time.perf_counter() - start
+
+    print(f"{len(configs)} configurations x {len(trace_bytes)} traces in {elapsed:.2f}s")
+    print(f"{'delay':>6} {'threshold':>10} {'class':>6} {'wagons':>7} {'replay ms':>10}  per trace")
+    for result in results:
+        per_trace = ' '.join(str(result['captures'][location]) for location in args.traces)
+        print(f"{result['capture_delay']:>6} {result['confidence_threshold']:>10.2f} {result['wagon_class_id']:>6} "
+              f"{result['total_captures']:>7} {result['replay_ms']:>10.1f}  {per_trace}")
+
+    if args.json:
+        with open(args.json, 'w') as json_file:
+            json.dump(results, json_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""
+Helpers for generating synthetic test clips used by the benchmarks.
+"""
+import cv2
+import numpy as np
+
+
+def write_synthetic_clip(path, num_frames=300, width=1280, height=720, fps=25, num_wagons=4):
+    """
+    Write a clip of rectangular 'wagons' sliding across a static track.
+
+    Wagons are separated by stretches of empty track so the clip exercises
+    both states of the capture state machine.
+    """
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"Could not open video writer for {path}")
+
+    background = np.full((height, width, 3), 90, dtype=np.uint8)
+    cv2.rectangle(background, (0, int(height * 0.8)), (width, int(height * 0.85)), (60, 60, 60), -1)
+
+    wagon_width = int(width * 0.6)
+    wagon_height = int(height * 0.5)
+    top = int(height * 0.3)
+    frames_per_wagon = max(1, num_frames // max(1, num_wagons))
+    speed = (width + wagon_width) / (frames_per_wagon * 0.6)
+
+    for i in range(num_frames):
+        frame = background.copy()
+        t = i % frames_per_wagon
+        left = int(width - t * speed)
+        if left + wagon_width > 0:
+            cv2.rectangle(frame, (left, top), (left + wagon_width, top + wagon_height), (40, 70, 150), -1)
+            cv2.putText(frame, f"W{i // frames_per_wagon + 1}", (left + 20, top + 60),
+                        cv2.FONT_HERSHEY_SIMPLEX, 2, (255, 255, 255), 3)
+        writer.write(frame)
+
+    writer.release()
+    return path
+
+
+def count_frames(path):
+    """Return the number of frames reported by the container of a clip."""
+    cap = cv2.VideoCapture(path)
+    try:
+        return int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    finally:
+        cap.release()
@@ -4,6 +4,13 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+def env_flag(name, default=False):
+    """Read a boolean setting from the environment: 1, true or yes (any case) mean on."""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes')
+
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'a-default-secret-key-for-development'
     
@@ -1,11 +1,19 @@
-from celery import Celery
+from celery import Celery, chord
+from celery.exceptions import Ignore
+from celery.signals import task_success, worker_process_init
+from celery.utils import uuid
 from kombu import Queue
 import time
 import logging
 import os 
 
-from .frame_extractor import FrameExtractor
-from .s3_utils import list_videos_in_folder
+from .frame_extractor import get_frame_extractor, reset_frame_extractor_cache
+from .s3_utils import list_videos_in_folder, processed_frames_folder, reset_s3_clients
+from .task_progress import (
+    ThrottledProgress, clear_child_tasks, publish_task_event, record_child_progress, register_child_tasks
+)
+from .stats_store import STATS_RECONCILE_INTERVAL_SECONDS, record_frames_extracted, reconcile_usage_stats
+from config import Config
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -31,15 +39,42 @@ celery.conf.update(
     enable_utc=True,
     worker_prefetch_multiplier=1,
     task_acks_late=True,
+    beat_schedule={
+        # Correct any drift in the incrementally maintained /system-status counters
+        'reconcile-usage-stats': {
+            'task': 'services.celery_worker.reconcile_usage_stats_task',
+            'schedule': STATS_RECONCILE_INTERVAL_SECONDS,
+        },
+    },
 )
 
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    """Give every prefork child its own S3 connection pool and load the model up front."""
+    reset_s3_clients()
+    reset_frame_extractor_cache()
+    try:
+        get_frame_extractor()
+    except Exception as e:
+        # Tasks retry the load lazily
+        logger.error(f"Could not preload the YOLO model: {e}", exc_info=True)
+
+def set_task_state(task, task_id, state, meta):
+    """Store a task state for /task-status and publish it to /task-events subscribers."""
+    task.update_state(task_id=task_id, state=state, meta=meta)
+    publish_task_event(task_id, state, **meta)
+
 @celery.task(bind=True)
 def process_s3_videos_task(self, bucket_name, s3_prefix):
     """
     Celery task to extract frames from all videos in a given S3 prefix.
+
+    Acts as a coordinator: every video becomes a process_video_task subtask
+    and the task is replaced by a chord whose callback, aggregate_video_results,
+    inherits this task's id. Clients keep polling and cancelling this id.
     """
     try:
-        self.update_state(state='PROGRESS', meta={'status': 'Initializing...', 'progress': 0, 'result': []})
+        set_task_state(self, self.request.id, 'PROGRESS', {'status': 'Initializing...', 'progress': 0})
         
         prefix_parts = s3_prefix.strip('/').split('/')
         
@@ -52,77 +87,149 @@ def process_s3_videos_task(self, bucket_name, s3_prefix):
         camera_angle_folder = prefix_parts[5]
         video_type_folder = prefix_parts[6]
         
-        base_output_path = os.path.join(
+        base_output_path = processed_frames_folder(
             base_folder,
             date_folder,
             client_name_folder,
-            'Processed Frames',
             camera_angle_folder,
             video_type_folder
         )
 
-        extractor = FrameExtractor()
-        success, folder_list = list_videos_in_folder(bucket_name, s3_prefix)
+        # Always list S3 directly so the task never works from a stale index entry
+        success, folder_list = list_videos_in_folder(bucket_name, s3_prefix, use_index=False)
 
         if not success:
             error_message = folder_list or "Failed to list videos from S3."
-            self.update_state(state='FAILURE', meta={'status': error_message})
+            set_task_state(self, self.request.id, 'FAILURE', {'status': error_message})
             return {'status': 'Failed', 'error': error_message}
         
         if not folder_list or not folder_list[0].get('videos'):
             error_message = "No videos found in the specified folder."
-            self.update_state(state='FAILURE', meta={'status': error_message})
+            set_task_state(self, self.request.id, 'FAILURE', {'status': error_message})
             return {'status': 'Failed', 'error': error_message}
 
         folder_info = folder_list[0]
         video_filenames = folder_info.get('videos', [])
         folder_prefix = folder_info.get('name', '')
-
         total_videos = len(video_filenames)
-        processed_videos = 0
-        all_extracted_frames = []
 
+        subtasks = []
         for video_filename in video_filenames:
             video_key = os.path.join(folder_prefix, video_filename).replace("\\", "/")
-            logger.info(f"Processing video: {video_key}")
-            
             video_name_without_ext = os.path.splitext(video_filename)[0]
             output_prefix = os.path.join(base_output_path, video_name_without_ext)
-
-            # Pass 'self' (the task instance) to the processing function
-            result = extractor.extract_frames_from_video_s3(
-                s3_key=video_key,
-                bucket_name=bucket_name,
-                output_prefix=output_prefix,
-                frame_interval=10,
-                task=self
-            )
-            
-            if result.get('success'):
-                all_extracted_frames.extend(result.get('frame_urls', []))
-            
-            processed_videos += 1
-            # Update overall progress after each video
-            progress = int((processed_videos / total_videos) * 100)
-            self.update_state(
-                state='PROGRESS',
-                meta={
-                    'status': f'Processing video {processed_videos} of {total_videos}',
-                    'progress': progress,
-                    'result': all_extracted_frames
-                }
+            subtasks.append(
+                process_video_task.s(bucket_name, video_key, output_prefix, self.request.id).set(task_id=uuid())
             )
 
-        final_result = {
-            'status': 'Completed',
-            'progress': 100,
-            'count': len(all_extracted_frames),
-            'result': all_extracted_frames
-        }
-        self.update_state(state='SUCCESS', meta=final_result)
-        return final_result
+        register_child_tasks(self.request.id, [subtask.id for subtask in subtasks])
+        set_task_state(
+            self, self.request.id, 'PROGRESS',
+            {'status': f'Processing video 0 of {total_videos}', 'progress': 0,
+             'videos_done': 0, 'videos_total': total_videos}
+        )
+        logger.info(f"Fanning out {total_videos} videos from {s3_prefix}")
+
+        return self.replace(chord(subtasks, aggregate_video_results.s(self.request.id)))
 
+    except Ignore:
+        # Raised by self.replace(); the chord callback now owns this task id
+        raise
     except Exception as e:
         logger.error(f"Error in Celery task: {e}", exc_info=True)
-        self.update_state(state='FAILURE', meta={'status': str(e)})
-        return {'status': 'Failed', 'error': str(e)}
\ No newline at end of file
+        set_task_state(self, self.request.id, 'FAILURE', {'status': str(e)})
+        return {'status': 'Failed', 'error': str(e)}
+
+@celery.task(bind=True)
+def process_video_task(self, bucket_name, video_key, output_prefix, parent_id):
+    """
+    Extract and upload the wagon frames of a single video. Progress is folded
+    into the PROGRESS meta of the parent task, which only carries counts; the
+    frame URLs are stored once, in the final result.
+    """
+    child_id = self.request.id
+
+    def publish_progress(progress, status=None):
+        parent_progress = record_child_progress(parent_id, child_id, progress)
+        if parent_progress is None:
+            return
+        overall, finished, total = parent_progress
+        set_task_state(
+            self, parent_id, 'PROGRESS',
+            {'status': f'Processing video {finished} of {total}', 'progress': overall,
+             'videos_done': finished, 'videos_total': total}
+        )
+
+    report_progress = ThrottledProgress(publish_progress)
+
+    try:
+        logger.info(f"Processing video: {video_key}")
+        start = time.perf_counter()
+        extractor = get_frame_extractor()
+        logger.info(f"Task startup (model ready) took {time.perf_counter() - start:.3f}s")
+        result = extractor.extract_frames_from_video_s3(
+            s3_key=video_key,
+            bucket_name=bucket_name,
+            output_prefix=output_prefix,
+            frame_interval=10,
+            progress_callback=report_progress
+        )
+        if result.get('success'):
+            # Frames kept from an earlier run were counted then
+            record_frames_extracted(result.get('uploaded', 0))
+    except Exception as e:
+        # Keep the chord going; the failure is reported in the aggregated result
+        logger.error(f"Error processing {video_key}: {e}", exc_info=True)
+        result = {'success': False, 'error': str(e)}
+
+    # The video is done: publish what the throttle held back, then mark it finished
+    report_progress.flush()
+    report_progress(100, force=True)
+    logger.info(f"Published {report_progress.published} progress updates for {video_key}")
+    return {
+        'video_key': video_key,
+        'success': bool(result.get('success')),
+        'error': result.get('error'),
+        'skipped': bool(result.get('skipped')),
+        'frame_urls': result.get('frame_urls', []),
+    }
+
+@celery.task(bind=True)
+def aggregate_video_results(self, video_results, parent_id):
+    """Chord callback: combine the per-video results, in folder order, into the parent's final result."""
+    all_extracted_frames = []
+    failed_videos = []
+    skipped_videos = 0
+    for video_result in video_results:
+        all_extracted_frames.extend(video_result.get('frame_urls', []))
+        skipped_videos += 1 if video_result.get('skipped') else 0
+        if not video_result.get('success'):
+            failed_videos.append({'video_key': video_result.get('video_key'), 'error': video_result.get('error')})
+
+    clear_child_tasks(parent_id)
+
+    final_result = {
+        'status': 'Completed',
+        'progress': 100,
+        'count': len(all_extracted_frames),
+        'result': all_extracted_frames
+    }
+    if failed_videos:
+        final_result['failed_videos'] = failed_videos
+    if skipped_videos:
+        # Already processed in an earlier run (see video_manifest)
+        final_result['skipped_videos'] = skipped_videos
+    # Stored once, as the task result
+    return final_result
+
+@task_success.connect(sender=aggregate_video_results)
+def publish_aggregated_result(sender=None, result=None, **kwargs):
+    """Tell /task-events subscribers that the result is stored; the URL list is fetched from /task-status."""
+    publish_task_event(sender.request.id, 'SUCCESS', status=result.get('status'),
+                       progress=100, count=result.get('count'))
+
+@celery.task
+def reconcile_usage_stats_task():
+    """Rescan the upload folder and overwrite the stored usage stats."""
+    stats = reconcile_usage_stats(Config.S3_BUCKET, Config.S3_UPLOAD_FOLDER)
+    return {'status': 'Completed', 'stats': stats}
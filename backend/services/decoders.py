@@ -0,0 +1,179 @@
+"""
+Video decode backends used by FrameExtractor.
+
+``open_video`` returns an object with the part of the cv2.VideoCapture
+interface the extractor uses: isOpened(), read(image=None), grab(),
+get()/set() for CAP_PROP_FRAME_COUNT and CAP_PROP_POS_FRAMES, and release().
+
+- 'opencv': cv2.VideoCapture on FFmpeg, with control over the decoder thread
+  count and optional hardware acceleration.
+- 'pyav': PyAV with frame- and slice-threaded codec contexts. Also allows
+  keyframe-only decoding at reduced resolution (see iter_keyframes), which
+  FrameExtractor uses to skip stretches without wagons.
+"""
+import os
+import logging
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DECODE_BACKEND = os.getenv('DECODE_BACKEND', 'opencv')
+# 0 keeps the library default (FFmpeg picks based on the core count)
+DECODE_THREADS = int(os.getenv('DECODE_THREADS', 0))
+# OpenCV only: 'none', 'any', 'vaapi', 'd3d11' or 'mfx'
+DECODE_HW_ACCELERATION = os.getenv('DECODE_HW_ACCELERATION', 'none')
+
+HW_ACCELERATION_TYPES = {
+    'any': 'VIDEO_ACCELERATION_ANY',
+    'vaapi': 'VIDEO_ACCELERATION_VAAPI',
+    'd3d11': 'VIDEO_ACCELERATION_D3D11',
+    'mfx': 'VIDEO_ACCELERATION_MFX',
+}
+
+
+def scaled_size(width, height, max_side):
+    """(width, height) shrunk so the longest side is at most ``max_side``; unchanged if 0 or already small."""
+    if not max_side or max(width, height) <= max_side:
+        return width, height
+    scale = max_side / max(width, height)
+    # Even sizes keep swscale and the detector's letterbox happy
+    return max(2, int(width * scale) // 2 * 2), max(2, int(height * scale) // 2 * 2)
+
+
+class PyAVCapture:
+    """A cv2.VideoCapture look-alike on top of a PyAV container."""
+
+    def __init__(self, video_path, threads=DECODE_THREADS):
+        import av
+
+        self._av = av
+        self._pending = None
+        self.position = 0
+        try:
+            self.container = av.open(video_path)
+        except av.error.FFmpegError as e:
+            logger.error(f"PyAV could not open {video_path}: {e}")
+            self.container = None
+            return
+
+        self.stream = self.container.streams.video[0]
+        # Decode several frames (and slices of a frame) in parallel
+        self.stream.thread_type = 'AUTO'
+        if threads:
+            self.stream.codec_context.thread_count = threads
+        self.fps = float(self.stream.average_rate or self.stream.guessed_rate or 0)
+        self._frames = self.container.decode(self.stream)
+
+    def isOpened(self):
+        return self.container is not None
+
+    def frame_number(self, frame):
+        """0-based position of a decoded frame, from its timestamp."""
+        start = self.stream.start_time or 0
+        return int(round((frame.pts - start) * self.stream.time_base * self.fps))
+
+    def _next(self):
+        if self._pending is not None:
+            frame, self._pending = self._pending, None
+            return frame
+        try:
+            return next(self._frames)
+        except (StopIteration, self._av.error.FFmpegError):
+            return None
+
+    def read(self, image=None):
+        frame = self._next()
+        if frame is None:
+            return False, None
+        self.position += 1
+        array = frame.to_ndarray(format='bgr24')
+        if image is not None and image.shape == array.shape:
+            np.copyto(image, array)
+            return True, image
+        return True, array
+
+    def grab(self):
+        if self._next() is None:
+            return False
+        self.position += 1
+        return True
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            if self.stream.frames:
+                return float(self.stream.frames)
+            if self.stream.duration and self.fps:
+                return float(int(self.stream.duration * self.stream.time_base * self.fps))
+            return 0.0
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self.position)
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        return 0.0
+
+    def set(self, prop, value):
+        """Only CAP_PROP_POS_FRAMES is supported: seek to the keyframe before it and decode up to it."""
+        if prop != cv2.CAP_PROP_POS_FRAMES or not self.fps:
+            return False
+        target = int(value)
+        start = self.stream.start_time or 0
+        self.container.seek(int(start + target / self.fps / self.stream.time_base), stream=self.stream, backward=True)
+        self._frames = self.container.decode(self.stream)
+        self._pending = None
+        while True:
+            frame = self._next()
+            if frame is None or frame.pts is None:
+                return False
+            if self.frame_number(frame) >= target:
+                self._pending = frame
+                self.position = target
+                return True
+
+    def release(self):
+        if self.container is not None:
+            self.container.close()
+            self.container = None
+
+
+def open_video(video_path, backend=None, threads=None, hw_acceleration=None):
+    """Open ``video_path`` with the decode backend ``backend`` (DECODE_BACKEND by default)."""
+    backend = backend or DECODE_BACKEND
+    threads = DECODE_THREADS if threads is None else threads
+    if backend == 'pyav':
+        return PyAVCapture(video_path, threads=threads)
+    if backend != 'opencv':
+        raise ValueError(f"Unknown decode backend: {backend}")
+
+    hw_acceleration = hw_acceleration or DECODE_HW_ACCELERATION
+    params = []
+    if threads:
+        params += [cv2.CAP_PROP_N_THREADS, threads]
+    if hw_acceleration != 'none':
+        params += [cv2.CAP_PROP_HW_ACCELERATION, getattr(cv2, HW_ACCELERATION_TYPES[hw_acceleration])]
+    if not params:
+        return cv2.VideoCapture(video_path)
+    return cv2.VideoCapture(video_path, cv2.CAP_FFMPEG, params)
+
+
+def iter_keyframes(video_path, max_side=0, threads=None):
+    """
+    Yield (frame number, frame) for the keyframes of a video only, scaled
+    during colour conversion so the longest side is at most ``max_side``.
+    Non-keyframes are skipped inside the codec, without being decoded.
+    """
+    capture = PyAVCapture(video_path, threads=DECODE_THREADS if threads is None else threads)
+    if not capture.isOpened():
+        return
+    try:
+        capture.stream.codec_context.skip_frame = 'NONKEY'
+        width, height = scaled_size(capture.stream.width, capture.stream.height, max_side)
+        while True:
+            frame = capture._next()
+            if frame is None:
+                break
+            if frame.pts is None:
+                continue
+            yield capture.frame_number(frame), frame.to_ndarray(format='bgr24', width=width, height=height)
+    finally:
+        capture.release()
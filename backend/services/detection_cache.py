@@ -0,0 +1,102 @@
+"""
+Content-addressed cache of per-frame detector output.
+
+Detections of a video are stored as one compressed NumPy archive keyed by the
+source object's ETag and the model version, so reprocessing the same video
+with the same model, or replaying the capture state machine with different
+settings, does not need to run inference again.
+
+Archive layout (columnar, one row per detection):
+    counts      int32   [num_frames]   detections in each frame, in frame order
+    detections  float32 [total, 6]     x1, y1, x2, y2, confidence, class id
+"""
+import io
+import os
+import logging
+import numpy as np
+from botocore.exceptions import ClientError
+
+from .s3_utils import get_s3_client, upload_bytes_to_s3
+from config import env_flag
+
+logger = logging.getLogger(__name__)
+
+DETECTION_CACHE_ENABLED = env_flag('DETECTION_CACHE_ENABLED', True)
+# Cache objects live in the processing bucket under this prefix
+DETECTION_CACHE_PREFIX = os.getenv('DETECTION_CACHE_PREFIX', 'detection-cache')
+
+
+class VideoDetections:
+    """Detector output for every frame of a video, appended in frame order."""
+
+    def __init__(self, counts=None, detections=None):
+        self._counts = list(counts) if counts is not None else []
+        self._chunks = [np.asarray(detections, dtype=np.float32).reshape(-1, 6)] if detections is not None else []
+        self._table = None
+        self._offsets = None
+
+    def append(self, detections):
+        """Add the [N, 6] detections of the next frame."""
+        detections = np.asarray(detections, dtype=np.float32).reshape(-1, 6)
+        self._counts.append(len(detections))
+        self._chunks.append(detections)
+        self._table = None
+
+    def _build(self):
+        if self._table is None:
+            self._table = np.concatenate(self._chunks) if self._chunks else np.zeros((0, 6), dtype=np.float32)
+            self._chunks = [self._table]
+            self._offsets = np.concatenate(([0], np.cumsum(self._counts, dtype=np.int64)))
+        return self._table
+
+    def __len__(self):
+        return len(self._counts)
+
+    def __getitem__(self, frame_number):
+        """Detections of the frame at 0-based position ``frame_number``."""
+        table = self._build()
+        return table[self._offsets[frame_number]:self._offsets[frame_number + 1]]
+
+    def __iter__(self):
+        for frame_number in range(len(self)):
+            yield self[frame_number]
+
+    def to_bytes(self):
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, counts=np.asarray(self._counts, dtype=np.int32), detections=self._build())
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data):
+        with np.load(io.BytesIO(data), allow_pickle=False) as archive:
+            return cls(counts=archive['counts'].tolist(), detections=archive['detections'])
+
+
+def detection_cache_key(source_etag, model_version):
+    etag = source_etag.strip('"')
+    return f"{DETECTION_CACHE_PREFIX}/{model_version}/{etag}.npz"
+
+
+def load_detections(bucket_name, source_etag, model_version):
+    """Cached detections of the source with ``source_etag``, or None on a miss."""
+    s3_key = detection_cache_key(source_etag, model_version)
+    try:
+        response = get_s3_client().get_object(Bucket=bucket_name, Key=s3_key)
+        return VideoDetections.from_bytes(response['Body'].read())
+    except ClientError as e:
+        if e.response['Error']['Code'] not in ('NoSuchKey', '404'):
+            logger.warning(f"Could not read cached detections {s3_key}: {e}")
+    except (ValueError, KeyError, OSError) as e:
+        logger.warning(f"Ignoring unreadable cached detections {s3_key}: {e}")
+    return None
+
+
+def save_detections(bucket_name, source_etag, model_version, detections):
+    """Store the detections of a fully processed video; returns (success, message)."""
+    s3_key = detection_cache_key(source_etag, model_version)
+    success, message = upload_bytes_to_s3(
+        detections.to_bytes(), bucket_name, s3_key, content_type='application/octet-stream'
+    )
+    if not success:
+        logger.warning(f"Could not cache detections {s3_key}: {message}")
+    return success, message
@@ -0,0 +1,240 @@
+"""
+Detector backends used by FrameExtractor.
+
+Every backend exposes ``detect(frames, conf, image_size=None)`` which takes a
+list of BGR frames and returns, per frame, an array of shape [N, 6] with rows
+(x1, y1, x2, y2, confidence, class_id) in original frame coordinates.
+"""
+import os
+import ast
+import logging
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DETECTOR_BACKEND = os.getenv('DETECTOR_BACKEND', 'ultralytics')
+ONNX_MODEL_PATH = os.getenv('ONNX_MODEL_PATH', '')
+# 0 lets onnxruntime pick; set to the cores a worker should use
+ONNX_INTRA_OP_THREADS = int(os.getenv('ONNX_INTRA_OP_THREADS', 0))
+ONNX_GRAPH_OPTIMIZATION = os.getenv('ONNX_GRAPH_OPTIMIZATION', 'all')
+# e.g. 'OpenVINOExecutionProvider,CPUExecutionProvider' with onnxruntime-openvino
+ONNX_PROVIDERS = [p for p in os.getenv('ONNX_PROVIDERS', 'CPUExecutionProvider').split(',') if p]
+
+NMS_IOU_THRESHOLD = 0.7  # Ultralytics default
+MAX_DETECTIONS = 300
+DEFAULT_IMAGE_SIZE = 640
+# Input sizes are rounded up to a multiple of the largest YOLO stride, as Ultralytics does
+MODEL_STRIDE = 32
+
+_EMPTY = np.zeros((0, 6), dtype=np.float32)
+
+
+class UltralyticsDetector:
+    """The stock Ultralytics YOLO path (PyTorch)."""
+
+    name = 'ultralytics'
+
+    def __init__(self, model):
+        from ultralytics import YOLO
+
+        self.model_path = model if isinstance(model, str) else getattr(model, 'ckpt_path', None)
+        self.model = YOLO(model) if isinstance(model, str) else model
+
+    def detect(self, frames, conf, image_size=None):
+        kwargs = {'imgsz': image_size} if image_size else {}
+        results = self.model(frames, verbose=False, conf=conf, **kwargs)
+        return [
+            result.boxes.data.cpu().numpy().astype(np.float32) if result.boxes else _EMPTY
+            for result in results
+        ]
+
+
+def letterbox(frame, image_size):
+    """Resize keeping aspect ratio and pad to a square, like Ultralytics does for exported models."""
+    height, width = frame.shape[:2]
+    ratio = min(image_size / height, image_size / width)
+    new_width, new_height = int(round(width * ratio)), int(round(height * ratio))
+    pad_x, pad_y = (image_size - new_width) / 2, (image_size - new_height) / 2
+
+    if (new_width, new_height) != (width, height):
+        frame = cv2.resize(frame, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+    top, bottom = int(round(pad_y - 0.1)), int(round(pad_y + 0.1))
+    left, right = int(round(pad_x - 0.1)), int(round(pad_x + 0.1))
+    padded = cv2.copyMakeBorder(frame, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(114, 114, 114))
+    return padded, ratio, (left, top)
+
+
+class OnnxDetector:
+    """
+    A YOLO model exported to ONNX (``yolo export format=onnx``), run with onnxruntime.
+
+    Pre- and post-processing (letterbox, confidence filter, per-class NMS)
+    mirror Ultralytics, so boxes match the PyTorch path within a small
+    tolerance. Models exported with ``dynamic=True`` run whole batches in
+    one session call and accept any input size; static models are run frame
+    by frame at the size they were exported with.
+    """
+
+    name = 'onnx'
+
+    def __init__(self, model_path, intra_op_threads=ONNX_INTRA_OP_THREADS,
+                 graph_optimization=ONNX_GRAPH_OPTIMIZATION, providers=None, image_size=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        options.graph_optimization_level = {
+            'disabled': ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+            'basic': ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+            'extended': ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+            'all': ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+        }[graph_optimization]
+
+        available = ort.get_available_providers()
+        providers = [p for p in (providers or ONNX_PROVIDERS) if p in available] or ['CPUExecutionProvider']
+
+        self.model_path = model_path
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=providers)
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.image_size = self._input_size(model_input, image_size)
+        self.dynamic_batch = not isinstance(model_input.shape[0], int)
+        self.dynamic_size = not isinstance(model_input.shape[2], int)
+        logger.info(f"Loaded ONNX model {model_path} with {providers} (dynamic batch: {self.dynamic_batch})")
+
+    def _input_size(self, model_input, image_size):
+        """
+        A static input height wins; otherwise ``image_size``, then the 'imgsz'
+        Ultralytics writes into the model metadata at export, then 640.
+        """
+        if isinstance(model_input.shape[2], int):
+            return model_input.shape[2]
+        if image_size:
+            return image_size
+        imgsz = self.session.get_modelmeta().custom_metadata_map.get('imgsz')
+        if not imgsz:
+            return DEFAULT_IMAGE_SIZE
+        try:
+            # Written as e.g. "[640, 640]"
+            size = ast.literal_eval(imgsz)
+            return int(max(size) if isinstance(size, (list, tuple)) else size)
+        except (ValueError, SyntaxError, TypeError):
+            logger.warning(f"Ignoring unreadable imgsz metadata in {self.model_path}: {imgsz}")
+            return DEFAULT_IMAGE_SIZE
+
+    def _preprocess(self, frames, image_size):
+        blobs, transforms = [], []
+        for frame in frames:
+            padded, ratio, pad = letterbox(frame, image_size)
+            blobs.append(padded[:, :, ::-1].transpose(2, 0, 1))  # BGR HWC -> RGB CHW
+            transforms.append((ratio, pad, frame.shape[:2]))
+        batch = np.ascontiguousarray(np.stack(blobs), dtype=np.float32) / 255.0
+        return batch, transforms
+
+    def _postprocess(self, prediction, conf, transform):
+        ratio, (pad_x, pad_y), (height, width) = transform
+        prediction = prediction.T  # [anchors, 4 + classes]
+        class_scores = prediction[:, 4:]
+        class_ids = class_scores.argmax(axis=1)
+        scores = class_scores[np.arange(len(class_ids)), class_ids]
+
+        keep = scores >= conf
+        if not keep.any():
+            return _EMPTY
+        boxes, scores, class_ids = prediction[keep, :4], scores[keep], class_ids[keep]
+
+        # cx, cy, w, h in letterboxed pixels -> x, y, w, h in original pixels
+        xywh = np.empty_like(boxes)
+        xywh[:, 0] = (boxes[:, 0] - boxes[:, 2] / 2 - pad_x) / ratio
+        xywh[:, 1] = (boxes[:, 1] - boxes[:, 3] / 2 - pad_y) / ratio
+        xywh[:, 2] = boxes[:, 2] / ratio
+        xywh[:, 3] = boxes[:, 3] / ratio
+
+        indices = cv2.dnn.NMSBoxesBatched(
+            xywh.tolist(), scores.tolist(), class_ids.tolist(), conf, NMS_IOU_THRESHOLD
+        )
+        indices = np.array(indices, dtype=int).flatten()[:MAX_DETECTIONS]
+        if indices.size == 0:
+            return _EMPTY
+
+        detections = np.empty((len(indices), 6), dtype=np.float32)
+        detections[:, 0] = np.clip(xywh[indices, 0], 0, width)
+        detections[:, 1] = np.clip(xywh[indices, 1], 0, height)
+        detections[:, 2] = np.clip(xywh[indices, 0] + xywh[indices, 2], 0, width)
+        detections[:, 3] = np.clip(xywh[indices, 1] + xywh[indices, 3], 0, height)
+        detections[:, 4] = scores[indices]
+        detections[:, 5] = class_ids[indices]
+        # Highest confidence first, like Ultralytics
+        return detections[np.argsort(-detections[:, 4], kind='stable')]
+
+    def detect(self, frames, conf, image_size=None):
+        if not frames:
+            return []
+        # A static model only accepts the size it was exported with
+        if image_size and self.dynamic_size:
+            image_size = -(-image_size // MODEL_STRIDE) * MODEL_STRIDE
+        else:
+            image_size = self.image_size
+        batch, transforms = self._preprocess(frames, image_size)
+        if self.dynamic_batch:
+            predictions = self.session.run(None, {self.input_name: batch})[0]
+        else:
+            predictions = np.concatenate(
+                [self.session.run(None, {self.input_name: batch[i:i + 1]})[0] for i in range(len(frames))]
+            )
+        return [self._postprocess(prediction, conf, transform) for prediction, transform in zip(predictions, transforms)]
+
+
+def onnx_path_for(model_path):
+    """The ONNX file to use for a set of weights: ONNX_MODEL_PATH, or the weights path with .onnx."""
+    return ONNX_MODEL_PATH or os.path.splitext(model_path)[0] + '.onnx'
+
+
+def load_detector(model_path, backend=None):
+    """
+    Create the detector for ``backend`` (DETECTOR_BACKEND by default).
+    Returns None if the model file does not exist.
+    """
+    backend = backend or DETECTOR_BACKEND
+    if backend == 'onnx':
+        if not model_path.endswith('.onnx'):
+            model_path = onnx_path_for(model_path)
+        if not os.path.exists(model_path):
+            logger.error(f"ONNX model not found at path: {model_path}")
+            return None
+        return OnnxDetector(model_path)
+
+    if backend != 'ultralytics':
+        raise ValueError(f"Unknown detector backend: {backend}")
+    if not os.path.exists(model_path):
+        logger.error(f"YOLO model not found at path: {model_path}")
+        return None
+    return UltralyticsDetector(model_path)
+
+
+def as_detector(model):
+    """Accept a detector backend or a bare Ultralytics YOLO model."""
+    return model if hasattr(model, 'detect') else UltralyticsDetector(model)
+
+
+def export_onnx(weights_path, output_path=None, image_size=640, int8=False):
+    """
+    Export Ultralytics weights to ONNX with a dynamic batch dimension.
+    With ``int8``, also write a dynamically quantized INT8 copy and return its path.
+    """
+    from ultralytics import YOLO
+
+    exported = YOLO(weights_path).export(format='onnx', imgsz=image_size, dynamic=True, simplify=True)
+    output_path = output_path or onnx_path_for(weights_path)
+    if os.path.abspath(exported) != os.path.abspath(output_path):
+        os.replace(exported, output_path)
+
+    if int8:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        int8_path = os.path.splitext(output_path)[0] + '.int8.onnx'
+        quantize_dynamic(output_path, int8_path, weight_type=QuantType.QUInt8)
+        return int8_path
+    return output_path
@@ -0,0 +1,56 @@
+"""
+Incremental parsing of multipart/form-data request bodies.
+
+Werkzeug's request.files spools every uploaded file to memory or disk before
+the view runs. iter_form_data reads request.stream itself and hands file
+contents over chunk by chunk, so they can be forwarded while they arrive.
+"""
+import os
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NeedData
+
+FORM_READ_SIZE = int(os.getenv('FORM_READ_SIZE', 256 * 1024))
+# Plain (non-file) fields are kept in memory; anything larger is rejected
+MAX_FORM_FIELD_SIZE = 64 * 1024
+
+
+def iter_form_data(stream, boundary, read_size=FORM_READ_SIZE):
+    """
+    Parse a multipart/form-data body while reading it from ``stream``.
+
+    Yields, in body order:
+        ('field', name, value)                     a complete text field
+        ('file', name, (filename, content_type))   the start of a file
+        ('data', name, chunk)                      bytes of the current file
+
+    Fields sent after a file are only seen once the file has been read, so
+    clients should put them first.
+    """
+    decoder = MultipartDecoder(boundary)
+    part = None
+    field_data = bytearray()
+
+    while True:
+        chunk = stream.read(read_size)
+        decoder.receive_data(chunk or None)
+        event = decoder.next_event()
+        while not isinstance(event, (Epilogue, NeedData)):
+            if isinstance(event, Field):
+                part = event
+                field_data = bytearray()
+            elif isinstance(event, File):
+                part = event
+                yield 'file', event.name, (event.filename, event.headers.get('Content-Type'))
+            elif isinstance(event, Data):
+                if isinstance(part, File):
+                    if event.data:
+                        yield 'data', part.name, event.data
+                else:
+                    field_data += event.data
+                    if len(field_data) > MAX_FORM_FIELD_SIZE:
+                        raise RequestEntityTooLarge(f"Form field {part.name} is too large.")
+                    if not event.more_data:
+                        yield 'field', part.name, field_data.decode('utf-8', 'replace')
+            event = decoder.next_event()
+        if not chunk or isinstance(event, Epilogue):
+            return
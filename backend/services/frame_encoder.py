@@ -0,0 +1,97 @@
+"""
+Encoding of captured wagon frames for upload.
+
+Frames are encoded on a thread pool (cv2.imencode releases the GIL) as JPEG
+or WebP at a configurable quality, optionally together with a downscaled
+thumbnail that galleries can load before the full frame.
+"""
+import os
+import logging
+import cv2
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .decoders import scaled_size
+
+logger = logging.getLogger(__name__)
+
+# 'jpeg' or 'webp'
+FRAME_FORMAT = os.getenv('FRAME_FORMAT', 'jpeg')
+# 0-100; 95 is OpenCV's JPEG default
+FRAME_QUALITY = int(os.getenv('FRAME_QUALITY', 95))
+# Longest side of the thumbnail written next to every frame; 0 = no thumbnails
+THUMBNAIL_MAX_SIDE = int(os.getenv('THUMBNAIL_MAX_SIDE', 320))
+THUMBNAIL_QUALITY = int(os.getenv('THUMBNAIL_QUALITY', 80))
+ENCODE_WORKERS = int(os.getenv('ENCODE_WORKERS', 4))
+
+THUMBNAIL_FOLDER = 'thumbnails'
+
+# format -> (file extension, content type, OpenCV quality flag)
+ENCODE_FORMATS = {
+    'jpeg': ('.jpg', 'image/jpeg', cv2.IMWRITE_JPEG_QUALITY),
+    'webp': ('.webp', 'image/webp', cv2.IMWRITE_WEBP_QUALITY),
+}
+
+
+def thumbnail_key(frame_key):
+    """S3 key of the thumbnail of the frame stored at ``frame_key``."""
+    folder, filename = os.path.split(frame_key)
+    return os.path.join(folder, THUMBNAIL_FOLDER, filename).replace("\\", "/")
+
+
+class FrameEncoder:
+    def __init__(self, image_format=FRAME_FORMAT, quality=FRAME_QUALITY, thumbnail_max_side=THUMBNAIL_MAX_SIDE,
+                 thumbnail_quality=THUMBNAIL_QUALITY, max_workers=ENCODE_WORKERS):
+        if image_format not in ENCODE_FORMATS:
+            raise ValueError(f"Unknown frame format: {image_format}")
+        self.image_format = image_format
+        self.extension, self.content_type, self._quality_flag = ENCODE_FORMATS[image_format]
+        self.quality = quality
+        self.thumbnail_max_side = thumbnail_max_side
+        self.thumbnail_quality = thumbnail_quality
+        self.max_workers = max(1, max_workers)
+
+    def _imencode(self, image, quality):
+        ok, encoded = cv2.imencode(self.extension, image, [self._quality_flag, int(quality)])
+        if not ok:
+            raise ValueError(f"Could not encode frame as {self.image_format}")
+        return encoded.tobytes()
+
+    def encode(self, frame):
+        """Return (image bytes, thumbnail bytes or None) for a BGR frame."""
+        image_bytes = self._imencode(frame, self.quality)
+        if not self.thumbnail_max_side:
+            return image_bytes, None
+
+        height, width = frame.shape[:2]
+        size = scaled_size(width, height, self.thumbnail_max_side)
+        thumbnail = cv2.resize(frame, size, interpolation=cv2.INTER_AREA) if size != (width, height) else frame
+        return image_bytes, self._imencode(thumbnail, self.thumbnail_quality)
+
+    def _encode_item(self, item, frame, release):
+        try:
+            return self.encode(frame)
+        finally:
+            if release is not None:
+                release(item)
+
+    def iter_encode(self, items, release=None):
+        """
+        Encode an iterable of (item, frame) pairs on a bounded thread pool.
+
+        Yields (item, image bytes, thumbnail bytes or None) in input order.
+        ``release(item)`` is called once a frame has been encoded, on the
+        worker thread, so the caller can reuse the frame's memory right away.
+        """
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='frame-encode') as executor:
+            for item, frame in items:
+                pending.append((item, executor.submit(self._encode_item, item, frame, release)))
+
+                while pending and (len(pending) > self.max_workers or pending[0][1].done()):
+                    item, future = pending.popleft()
+                    yield (item,) + future.result()
+
+            while pending:
+                item, future = pending.popleft()
+                yield (item,) + future.result()
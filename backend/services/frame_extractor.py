@@ -1,145 +1,604 @@
 import cv2
 import os
-import collections
+import contextlib
+import hashlib
 import logging
-from ultralytics import YOLO
-from .s3_utils import download_file_from_s3, upload_bytes_to_s3, generate_presigned_url
+import threading
+import time
+import numpy as np
+from .decoders import iter_keyframes, open_video
+from .detection_cache import DETECTION_CACHE_ENABLED, VideoDetections, load_detections, save_detections
+from .detectors import as_detector, load_detector
+from .frame_encoder import FrameEncoder, thumbnail_key
+from .frame_pool import FramePool
+from .motion_gate import MotionGate
+from .pipeline import Pipeline
+from .s3_stream import s3_video_fifo
+from .s3_utils import download_file_from_s3, iter_upload_to_s3, generate_presigned_url
+from .video_manifest import RESUMABLE_PROCESSING_ENABLED, VideoManifest, get_object_etag
+from .wagon_capture import CONFIDENCE_THRESHOLD, FRAME_BUFFER_SIZE, WagonCaptureTracker, wagon_boxes_from_detections
+from config import env_flag
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# --- Configuration ---
+# Capture settings (CONFIDENCE_THRESHOLD, CAPTURE_DELAY, ...) live in wagon_capture
+
+# Number of decoded frames sent to the YOLO model in a single call
+DEFAULT_BATCH_SIZE = int(os.getenv('YOLO_BATCH_SIZE', 8))
+
+# Depth of the bounded queue after each pipeline stage. Decode and inference
+# stages pass whole batches, the later stages pass single wagon frames.
+DEFAULT_QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', 4))
+PIPELINE_STAGES = ('decode', 'infer', 'capture', 'encode', 'upload')
+
+# Frame slots shared by the pipeline stages. The minimum that guarantees
+# progress is FRAME_BUFFER_SIZE + 1 + batch size; extra slots let the decoder
+# run further ahead of the later stages.
+FRAME_POOL_SLOTS = int(os.getenv('FRAME_POOL_SLOTS', 0))
+
+# Decode S3 videos while they are still being fetched with ranged GETs
+S3_STREAMING_ENABLED = env_flag('S3_STREAMING_ENABLED', False)
+
+# Inference image size handed to the detector (Ultralytics 'imgsz'). Unset or
+# 0 keeps the size the model was trained / exported with.
+DETECTION_IMAGE_SIZE = int(os.getenv('YOLO_IMAGE_SIZE', 0)) or None
+# If set, frames are downscaled once so their longest side is at most this many
+# pixels before detection; boxes are mapped back to full resolution. 0 = off.
+DETECTION_MAX_SIDE = int(os.getenv('DETECTION_MAX_SIDE', 0))
+
+# Where worker processes load the detector from
+MODEL_PATH = os.getenv('YOLO_MODEL_PATH', 'models/best_weights.pt')
+
+# Skip inference on static frames while no wagon is in view (see MotionGate)
+MOTION_GATING_ENABLED = env_flag('MOTION_GATING_ENABLED', False)
+
+# Detect on keyframes first (PyAV, reduced resolution) and fully decode only the
+# stretches around keyframes that show a wagon. Wagons that enter and leave
+# between two empty keyframes are missed, so this suits long stretches of
+# empty track and short GOPs.
+KEYFRAME_SCOUTING_ENABLED = env_flag('KEYFRAME_SCOUTING_ENABLED', False)
+SCOUT_MAX_SIDE = int(os.getenv('SCOUT_MAX_SIDE', 640))
+
+
+def read_frame_batches(cap, batch_size, pool, cancel=None, max_frames=None):
+    """
+    Decode into ``pool`` and yield lists of up to ``batch_size`` slot indices
+    until the video ends or ``max_frames`` frames were read.
+    """
+    remaining = max_frames
+    while cap.isOpened():
+        size = batch_size if remaining is None else min(batch_size, remaining)
+        if size <= 0:
+            break
+        batch_slots = []
+        while len(batch_slots) < size:
+            slot = pool.read_into(cap, cancel=cancel)
+            if slot is None:
+                break
+            batch_slots.append(slot)
+
+        if remaining is not None:
+            remaining -= len(batch_slots)
+        if batch_slots:
+            yield batch_slots
+        if len(batch_slots) < size:
+            break
+
+
+def wagon_frame_ranges(keyframes):
+    """
+    Turn keyframe scouting results, a list of (frame number, wagon seen) in
+    order, into merged [start, stop) frame ranges that need full decoding.
+    A stop of None means the end of the video. Every keyframe showing a wagon
+    pulls in the stretch from the keyframe before it up to and including the
+    keyframe after it, so the state machine sees the wagon enter and leave.
+    """
+    ranges = []
+    for i, (frame_number, wagon_seen) in enumerate(keyframes):
+        if not wagon_seen:
+            continue
+        start = keyframes[i - 1][0] if i > 0 else 0
+        stop = keyframes[i + 1][0] + 1 if i + 1 < len(keyframes) else None
+        if ranges and ranges[-1][1] is not None and start <= ranges[-1][1]:
+            ranges[-1] = (ranges[-1][0], stop)
+        else:
+            ranges.append((start, stop))
+    return ranges
+
+
+def seek_to_frame(cap, frame_count):
+    """Continue reading at frame ``frame_count`` (0-based), by seeking if the container allows it."""
+    if frame_count == int(cap.get(cv2.CAP_PROP_POS_FRAMES)):
+        return
+    if cap.set(cv2.CAP_PROP_POS_FRAMES, frame_count) and int(cap.get(cv2.CAP_PROP_POS_FRAMES)) == frame_count:
+        return
+    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+    for _ in range(frame_count):
+        if not cap.grab():
+            break
+
+
+def report_frame_progress(task, frame_idx, total_frames, task_id=None, callback=None):
+    """
+    Report progress within the current video every 20 frames, either through
+    ``callback(progress, status)`` or as a PROGRESS update of ``task``.
+    """
+    if total_frames > 0 and frame_idx % 20 == 0:
+        progress = int((frame_idx / total_frames) * 90) # Progress within the video
+        status = f'Processing frame {frame_idx}/{total_frames}'
+        if callback is not None:
+            callback(progress, status)
+        elif task:
+            task.update_state(task_id=task_id, state='PROGRESS', meta={'status': status, 'progress': progress})
+
+
 class FrameExtractor:
-    def __init__(self, model_path='models/best_weights.pt'):
+    def __init__(self, model_path=MODEL_PATH, backend=None, image_size=DETECTION_IMAGE_SIZE,
+                 detection_max_side=DETECTION_MAX_SIDE):
         """
-        Initializes the FrameExtractor with a YOLO model.
+        Initializes the FrameExtractor with a detector backend (DETECTOR_BACKEND
+        by default) for the YOLO weights at ``model_path``.
         """
-        if os.path.exists(model_path):
-            self.model = YOLO(model_path)
-        else:
-            self.model = None
-            logger.error(f"YOLO model not found at path: {model_path}")
+        self.model_path = model_path
+        self.image_size = image_size
+        self.detection_max_side = detection_max_side
+        self.model = load_detector(model_path, backend)
+        self.weights_path = self.model.model_path if self.model is not None else model_path
+        self.model_mtime = self._weights_mtime()
+        self.model_version = self._model_version()
 
-    def extract_frames_from_video_s3(self, s3_key, bucket_name, output_prefix, frame_interval=10, task=None):
-        if not self.model:
-            return {'success': False, 'error': 'YOLO model not loaded.'}
+    def _model_version(self):
+        """
+        Identifies everything that changes the detector's output: the weights'
+        content and the detection resolution. Used to key cached detections.
+        """
+        digest = hashlib.sha1()
+        if self.weights_path and os.path.exists(self.weights_path):
+            with open(self.weights_path, 'rb') as weights_file:
+                for chunk in iter(lambda: weights_file.read(1 << 20), b''):
+                    digest.update(chunk)
+        return f"{digest.hexdigest()[:16]}-{self.image_size or 'model'}-{self.detection_max_side or 'full'}"
+
+    def _weights_mtime(self):
+        return os.path.getmtime(self.weights_path) if self.weights_path and os.path.exists(self.weights_path) else None
+
+    def weights_changed(self):
+        """True if the weights file on disk differs from the one that was loaded."""
+        return self._weights_mtime() != self.model_mtime
+
+    def warm_up(self, frame_size=640):
+        """Run one inference on a blank frame so the first real frame does not pay for lazy setup."""
+        if self.model is not None:
+            self.model.detect(
+                [np.zeros((frame_size, frame_size, 3), dtype=np.uint8)], CONFIDENCE_THRESHOLD, image_size=self.image_size
+            )
+
+    def _detect(self, model, frames):
+        """
+        Run the detector, on downscaled copies of the frames if detection_max_side
+        is set. Boxes are always returned in full-resolution coordinates.
+        """
+        height, width = frames[0].shape[:2]
+        scale = self.detection_max_side / max(height, width) if self.detection_max_side else 1.0
+        if scale < 1.0:
+            size = (int(round(width * scale)), int(round(height * scale)))
+            frames = [cv2.resize(frame, size, interpolation=cv2.INTER_AREA) for frame in frames]
+
+        batch_detections = as_detector(model).detect(frames, CONFIDENCE_THRESHOLD, image_size=self.image_size)
+        if scale < 1.0:
+            batch_detections = [
+                np.column_stack((detections[:, :4] / scale, detections[:, 4:])) for detections in batch_detections
+            ]
+        return batch_detections
+
+    def detect_wagons(self, model, frames, motion_gate=None, detection_log=None):
+        """
+        Run detection on a batch of frames; returns the wagon boxes per frame, in input order.
+        With a ``motion_gate``, only the frames it selects are sent to the model.
+        The raw detections of every frame are appended to ``detection_log``
+        (a VideoDetections), which is only meaningful without a motion gate.
+        """
+        if motion_gate is None:
+            batch_detections = self._detect(model, frames)
+            if detection_log is not None:
+                for detections in batch_detections:
+                    detection_log.append(detections)
+            return [wagon_boxes_from_detections(detections) for detections in batch_detections]
 
+        # The gate decides frame by frame, so a wagon found in one frame switches
+        # the rest of the batch to dense inference just as with a batch size of
+        # one. The frames it is expected to select still go to the model together.
+        thumbnails = [motion_gate.thumbnail(frame) for frame in frames]
+        inferred_boxes = {}
+        batch_boxes = []
+        for index, (frame, thumbnail) in enumerate(zip(frames, thumbnails)):
+            if not motion_gate.should_infer(frame, thumbnail):
+                batch_boxes.append(list(motion_gate.last_boxes))
+                continue
+            if index not in inferred_boxes:
+                expected = motion_gate.lookahead(thumbnails[index + 1:])
+                indices = [index] + [
+                    later for later, infer in enumerate(expected, index + 1) if infer and later not in inferred_boxes
+                ]
+                motion_gate.record_inferences(len(indices))
+                inferred_boxes.update(zip(indices, self.detect_wagons(model, [frames[i] for i in indices])))
+            motion_gate.observe(inferred_boxes[index])
+            batch_boxes.append(inferred_boxes[index])
+        return batch_boxes
+
+    def scout_frame_ranges(self, video_path, model, batch_size=None):
+        """
+        Run detection on the keyframes of a video only, decoded at reduced
+        resolution, and return the frame ranges that need full decoding (see
+        wagon_frame_ranges). Returns None if keyframe decoding is unavailable.
+        """
+        batch_size = batch_size or DEFAULT_BATCH_SIZE
+        keyframes = []
+        batch = []
+
+        def flush():
+            frame_numbers, frames = zip(*batch)
+            batch_detections = as_detector(model).detect(list(frames), CONFIDENCE_THRESHOLD, image_size=self.image_size)
+            for frame_number, detections in zip(frame_numbers, batch_detections):
+                keyframes.append((frame_number, bool(wagon_boxes_from_detections(detections))))
+            batch.clear()
+
+        start = time.perf_counter()
+        try:
+            for frame_number, frame in iter_keyframes(video_path, max_side=SCOUT_MAX_SIDE):
+                batch.append((frame_number, frame))
+                if len(batch) == batch_size:
+                    flush()
+            if batch:
+                flush()
+        except ImportError:
+            logger.warning("Keyframe scouting needs PyAV; decoding every frame")
+            return None
+        if not keyframes:
+            return None
+
+        ranges = wagon_frame_ranges(keyframes)
+        logger.info(f"Scouted {len(keyframes)} keyframes of {video_path} in {time.perf_counter() - start:.2f}s, "
+                    f"{sum(1 for _, seen in keyframes if seen)} with wagons: decoding {ranges}")
+        return ranges
+
+    @contextlib.contextmanager
+    def open_video_s3(self, s3_key, bucket_name, streaming=None):
+        """
+        Yield (local path the decoder can open, check) for an S3 video, or
+        (None, None) if it could not be fetched.
+
+        In streaming mode the path is a FIFO fed by ranged GETs, so decoding starts
+        with the first chunk, and ``check()`` raises StreamFailed if the stream
+        broke off before the end of the object. Videos that can not be streamed
+        are downloaded to temp_downloads as before; their check does nothing.
+        """
         # Create a temporary directory to store the downloaded video
         temp_dir = 'temp_downloads'
         os.makedirs(temp_dir, exist_ok=True)
+
+        if streaming is None:
+            streaming = S3_STREAMING_ENABLED
+        if streaming:
+            with s3_video_fifo(bucket_name, s3_key, temp_dir) as (fifo_path, check):
+                if fifo_path is not None:
+                    logger.info(f"Streaming {s3_key} from S3...")
+                    yield fifo_path, check
+                    return
+
         local_video_path = os.path.join(temp_dir, os.path.basename(s3_key))
 
         # Download the video from S3
         if not download_file_from_s3(bucket_name, s3_key, local_video_path):
-            return {'success': False, 'error': f'Failed to download video from S3: {s3_key}'}
+            yield None, None
+            return
 
-        # Process the video to extract frames, passing the task object for progress updates
-        saved_frame_count, saved_frames = self.extract_wagon_frames(local_video_path, self.model, task=task)
+        try:
+            yield local_video_path, lambda: None
+        finally:
+            # Clean up the local video file
+            if os.path.exists(local_video_path):
+                os.remove(local_video_path)
 
-        # Upload frames to S3
-        frame_urls = []
-        if saved_frame_count > 0:
-            for i, frame_img in enumerate(saved_frames):
-                frame_filename = f"frame_{i+1}.jpg"
-                frame_s3_key = os.path.join(output_prefix, frame_filename).replace("\\", "/")
-                
-                # Encode frame to JPG bytes
-                _, img_encoded = cv2.imencode('.jpg', frame_img)
-                image_bytes = img_encoded.tobytes()
-
-                # Upload to S3
-                success, message = upload_bytes_to_s3(image_bytes, bucket_name, frame_s3_key)
+    @staticmethod
+    def presigned_urls(bucket_name, s3_keys):
+        urls = (generate_presigned_url(bucket_name, s3_key) for s3_key in s3_keys)
+        return [url for url in urls if url]
+
+    def extract_frames_from_video_s3(self, s3_key, bucket_name, output_prefix, frame_interval=10, task=None,
+                                     batch_size=None, queue_sizes=None, motion_gating=None, streaming=None,
+                                     progress_callback=None, resume=None, detection_cache=None, scouting=None):
+        """
+        Extract the wagon frames of an S3 video into ``output_prefix``.
+
+        A manifest next to the frames records what was produced for the source's
+        current ETag; the gallery route reads it. With ``resume``
+        (RESUMABLE_PROCESSING_ENABLED by default) a finished video is not
+        processed again and an interrupted one continues after its last uploaded
+        wagon. ``uploaded`` in the result counts the frames written by this call only.
+
+        With ``detection_cache`` (DETECTION_CACHE_ENABLED by default) the detector
+        output is stored per source ETag and model version, and a video that was
+        seen before by the same model is processed without running inference.
+
+        With ``scouting`` (KEYFRAME_SCOUTING_ENABLED by default) only the stretches
+        around keyframes showing a wagon are fully decoded; see scout_frame_ranges.
+        """
+        if not self.model:
+            return {'success': False, 'error': 'YOLO model not loaded.'}
+
+        if motion_gating is None:
+            motion_gating = MOTION_GATING_ENABLED
+        motion_gate = MotionGate() if motion_gating else None
+
+        if scouting is None:
+            scouting = KEYFRAME_SCOUTING_ENABLED
+        if scouting:
+            # The video is read twice and seeked, which a streamed FIFO can not do
+            streaming = False
+        if resume is None:
+            resume = RESUMABLE_PROCESSING_ENABLED
+        if detection_cache is None:
+            detection_cache = DETECTION_CACHE_ENABLED
+        source_etag = get_object_etag(bucket_name, s3_key)
+        if resume and source_etag is not None:
+            manifest = VideoManifest.load(bucket_name, output_prefix, s3_key, source_etag)
+        else:
+            manifest = VideoManifest(bucket_name, output_prefix, s3_key, source_etag)
+
+        if manifest is not None and manifest.is_complete:
+            logger.info(f"Skipping {s3_key}: already processed ({len(manifest.frames)} frames)")
+            frame_urls = self.presigned_urls(bucket_name, manifest.frame_keys)
+            return {'success': True, 'frame_urls': frame_urls, 'count': len(frame_urls), 'uploaded': 0,
+                    'skipped': True}
+
+        if manifest is not None and manifest.resume_frame:
+            logger.info(f"Resuming {s3_key} after frame {manifest.resume_frame} ({len(manifest.frames)} frames done)")
+            # Resuming seeks, which a streamed FIFO can not do
+            streaming = False
+        previous_keys = manifest.frame_keys if manifest is not None else []
+
+        cached_detections = None
+        detection_log = None
+        if detection_cache and source_etag is not None:
+            cached_detections = load_detections(bucket_name, source_etag, self.model_version)
+            if cached_detections is not None:
+                logger.info(f"Using cached detections for {s3_key} ({len(cached_detections)} frames)")
+                motion_gate = None
+            elif motion_gate is None and not previous_keys and not scouting:
+                # Only a full pass without motion gating has the output of every frame
+                detection_log = VideoDetections()
+
+        # A stream that breaks off raises here, before the manifest is completed or detections are cached
+        with self.open_video_s3(s3_key, bucket_name, streaming=streaming) as (local_video_path, check_source):
+            if local_video_path is None:
+                return {'success': False, 'error': f'Failed to download video from S3: {s3_key}'}
+
+            # Decode, detect, capture, encode and upload run as concurrent stages
+            frame_urls, stage_stats = self.process_video_pipelined(
+                local_video_path, bucket_name, output_prefix,
+                task=task, batch_size=batch_size, queue_sizes=queue_sizes, motion_gate=motion_gate,
+                progress_callback=progress_callback, manifest=manifest,
+                cached_detections=cached_detections, detection_log=detection_log,
+                scouting=scouting and cached_detections is None, check_source=check_source
+            )
+
+        if detection_log is not None and len(detection_log):
+            save_detections(bucket_name, source_etag, self.model_version, detection_log)
+
+        uploaded = len(frame_urls)
+        frame_urls = self.presigned_urls(bucket_name, previous_keys) + frame_urls
+
+        result = {'success': True, 'frame_urls': frame_urls, 'count': len(frame_urls), 'uploaded': uploaded,
+                  'stage_stats': stage_stats, 'cached_detections': cached_detections is not None}
+        if motion_gate is not None:
+            result['motion_gate'] = motion_gate.report()
+            logger.info(f"Motion gate for {s3_key}: {result['motion_gate']}")
+        return result
+
+    def process_video_pipelined(self, video_path, bucket_name, output_prefix, task=None, batch_size=None,
+                                queue_sizes=None, motion_gate=None, progress_callback=None, manifest=None,
+                                cached_detections=None, detection_log=None, scouting=False, encoder=None,
+                                check_source=None):
+        """
+        Extract wagon frames from a local video and upload them to S3 as they are captured.
+
+        Each stage runs on its own thread behind a bounded queue whose depth can be
+        set per stage through ``queue_sizes`` (keys from PIPELINE_STAGES).
+        Progress goes to ``progress_callback(progress, status)`` if given, else to ``task``.
+        With a VideoManifest, uploaded frames are checkpointed to it and processing
+        starts again where the manifest left off. Frames covered by
+        ``cached_detections`` skip the detector; detector output is recorded in
+        ``detection_log``. With ``scouting``, only the frame ranges returned by
+        scout_frame_ranges are decoded. Frames, and their thumbnails, are encoded
+        by ``encoder`` (a FrameEncoder with the FRAME_* settings by default).
+        ``check_source()`` is called once every frame has been decoded and should
+        raise if the video could not be read completely; the manifest is then
+        only checkpointed, not completed.
+        Returns the presigned URLs of the uploaded frames and per-stage throughput stats.
+        """
+        if batch_size is None:
+            batch_size = DEFAULT_BATCH_SIZE
+        batch_size = max(1, int(batch_size))
+        queue_sizes = queue_sizes or {}
+        encoder = encoder or FrameEncoder()
+        model = self.model
+
+        frame_ranges = self.scout_frame_ranges(video_path, model, batch_size) if scouting else None
+
+        cap = open_video(video_path)
+        if not cap.isOpened():
+            logger.error(f"Error: Could not open video file {video_path}")
+            return [], []
+
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        # Celery keeps the current request per thread, so pass the id explicitly
+        task_id = task.request.id if task else None
+
+        # After the frame that committed the last recorded wagon the tracker is
+        # searching again with a full buffer; refilling the buffer with the frames
+        # up to that one restores exactly that state.
+        start_frame = 0
+        frames_done = 0
+        if manifest is not None:
+            start_frame = max(0, manifest.resume_frame - FRAME_BUFFER_SIZE)
+            frames_done = len(manifest.frames)
+        if frame_ranges is None:
+            frame_ranges = [(start_frame, None)]
+        frame_ranges = [
+            (max(range_start, start_frame), range_stop) for range_start, range_stop in frame_ranges
+            if range_stop is None or range_stop > start_frame
+        ]
+        # Source frame index of every frame in flight between encode and upload
+        commit_points = {}
+        upload_failed = False
+
+        pipeline = Pipeline(name=os.path.basename(video_path))
+        pool = FramePool(max(FRAME_POOL_SLOTS, FRAME_BUFFER_SIZE + 2 + 2 * batch_size + encoder.max_workers))
+
+        def decode():
+            # Batches are tagged with the 0-based number of their first frame
+            try:
+                for range_start, range_stop in frame_ranges:
+                    seek_to_frame(cap, range_start)
+                    frame_number = range_start
+                    max_frames = None if range_stop is None else range_stop - range_start
+                    for batch_slots in read_frame_batches(
+                            cap, batch_size, pool, cancel=pipeline.stop_event, max_frames=max_frames):
+                        yield frame_number, batch_slots
+                        frame_number += len(batch_slots)
+                if check_source is not None and not pipeline.stop_event.is_set():
+                    check_source()
+            finally:
+                cap.release()
+
+        def infer(batches):
+            for frame_number, batch_slots in batches:
+                batch_numbers = range(frame_number, frame_number + len(batch_slots))
+                if cached_detections is not None and batch_numbers[-1] < len(cached_detections):
+                    batch_boxes = [wagon_boxes_from_detections(cached_detections[n]) for n in batch_numbers]
+                else:
+                    batch_frames = [pool[slot] for slot in batch_slots]
+                    batch_boxes = self.detect_wagons(
+                        model, batch_frames, motion_gate=motion_gate, detection_log=detection_log
+                    )
+                yield frame_number, list(zip(batch_slots, batch_boxes))
+
+        def capture(detections):
+            tracker = WagonCaptureTracker(pool=pool)
+            frame_idx = start_frame
+            for frame_number, batch in detections:
+                if frame_number != frame_idx:
+                    # Jumped over a stretch without wagons; start over after it
+                    captured = tracker.finish()
+                    if captured is not None:
+                        yield captured, frame_idx
+                    tracker = WagonCaptureTracker(pool=pool)
+                    frame_idx = frame_number
+                for slot, wagon_boxes in batch:
+                    frame_idx += 1
+                    report_frame_progress(task, frame_idx, total_frames, task_id=task_id, callback=progress_callback)
+                    captured = tracker.update(slot, wagon_boxes, frame_idx=frame_idx)
+                    if captured is not None:
+                        yield captured, frame_idx
+            # Only encoding and uploads are left; publish the last throttled report
+            if hasattr(progress_callback, 'flush'):
+                progress_callback.flush()
+            captured = tracker.finish()
+            if captured is not None:
+                yield captured, frame_idx
+
+        def encode(captures):
+            def frames_to_encode():
+                for i, (captured, commit_frame) in enumerate(captures, start=frames_done):
+                    frame_filename = f"frame_{i+1}{encoder.extension}"
+                    frame_s3_key = os.path.join(output_prefix, frame_filename).replace("\\", "/")
+                    commit_points[frame_s3_key] = (captured.frame_idx, commit_frame, captured.box)
+                    yield (frame_s3_key, captured.frame), pool[captured.frame]
+
+            # Encoded on a thread pool; each slot goes back to the decoder as soon as its frame is encoded
+            for (frame_s3_key, _), image_bytes, thumbnail_bytes in encoder.iter_encode(
+                    frames_to_encode(), release=lambda item: pool.release(item[1])):
+                yield frame_s3_key, image_bytes, encoder.content_type
+                if thumbnail_bytes is not None:
+                    yield thumbnail_key(frame_s3_key), thumbnail_bytes, encoder.content_type
+
+        def upload(encoded_frames):
+            nonlocal upload_failed
+            # Frames are uploaded concurrently; results still come back in capture order
+            for frame_s3_key, success, message in iter_upload_to_s3(encoded_frames, bucket_name):
+                if frame_s3_key not in commit_points:
+                    # A thumbnail; the gallery falls back to the full frame if it is missing
+                    if not success:
+                        logger.warning(f"Failed to upload thumbnail {frame_s3_key}: {message}")
+                    continue
+                frame_idx, commit_frame, box = commit_points.pop(frame_s3_key)
                 if success:
+                    # A rerun resumes after the last frame uploaded without gaps
+                    if manifest is not None and not upload_failed:
+                        manifest.add_frame(
+                            frame_s3_key, frame_idx, commit_frame, box=box,
+                            thumbnail=thumbnail_key(frame_s3_key) if encoder.thumbnail_max_side else None
+                        )
                     # Generate a presigned URL for the uploaded frame
                     presigned_url = generate_presigned_url(bucket_name, frame_s3_key)
                     if presigned_url:
-                        frame_urls.append(presigned_url)
+                        yield presigned_url
                 else:
+                    upload_failed = True
                     logger.error(f"Failed to upload frame {frame_s3_key}: {message}")
 
-        # Clean up the local video file
-        if os.path.exists(local_video_path):
-            os.remove(local_video_path)
+        for name, func in zip(PIPELINE_STAGES, (decode, infer, capture, encode, upload)):
+            pipeline.add_stage(name, func, queue_size=queue_sizes.get(name, DEFAULT_QUEUE_SIZE))
 
-        return {'success': True, 'frame_urls': frame_urls, 'count': len(frame_urls)}
+        logger.info(f"Processing video: {video_path} (batch size {batch_size})...")
+        frame_urls = []
+        try:
+            frame_urls.extend(pipeline.run())
+        except BaseException:
+            if manifest is not None:
+                # Checkpoint whatever was uploaded so a rerun can resume
+                manifest.save()
+            raise
+        if manifest is not None and upload_failed:
+            manifest.save()
+        elif manifest is not None:
+            manifest.complete()
+        pipeline.log_stats()
+        logger.info(f"Processing complete. Uploaded {len(frame_urls)} individual wagon frames.")
+        return frame_urls, pipeline.stats_summary()
 
-    def extract_wagon_frames(self, video_path, model, task=None):
-        # --- Configuration ---
-        CONFIDENCE_THRESHOLD = 0.6
-        WAGON_CLASS_ID = 1  # Assuming '1' is the class ID for wagons
-        CAPTURE_DELAY = 5
-        FRAME_BUFFER_SIZE = CAPTURE_DELAY + 1
 
-        if model is None:
-            logger.error("YOLO model is not loaded. Aborting extraction.")
-            if task:
-                task.update_state(state='FAILURE', meta={'status': 'Model not loaded.'})
-            return 0, []
+_extractor_cache = threading.local()
 
-        cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
-            logger.error(f"Error: Could not open video file {video_path}")
-            return 0, []
 
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        frame_buffer = collections.deque(maxlen=FRAME_BUFFER_SIZE)
-        current_capture_state = "SEARCHING_FOR_WAGON"
-        potential_capture_frame_img = None
-        saved_frame_count = 0
-        saved_frames = []
-        frame_idx = 0
-
-        logger.info(f"Processing video: {video_path}...")
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
+def get_frame_extractor(model_path=MODEL_PATH):
+    """
+    Return a warmed-up FrameExtractor that is reused across tasks.
+
+    The model is loaded once per worker thread (once per process under the
+    prefork pool). YOLO models are not safe to share between threads running
+    inference concurrently, so thread-pool workers each get their own copy.
+    If the weights file changes on disk, the model is reloaded on the next
+    call, which lets new weights be deployed without restarting workers.
+    """
+    extractor = getattr(_extractor_cache, 'extractor', None)
+
+    if extractor is None or extractor.model_path != model_path or extractor.weights_changed():
+        reason = 'Loading' if extractor is None else 'Reloading changed'
+        start = time.perf_counter()
+        extractor = FrameExtractor(model_path=model_path)
+        extractor.warm_up()
+        _extractor_cache.extractor = extractor
+        logger.info(f"{reason} YOLO model {model_path} took {time.perf_counter() - start:.2f}s")
+    return extractor
+
 
-            frame_idx += 1
-            
-            # This block will now execute and send progress updates
-            if task and total_frames > 0 and frame_idx % 20 == 0:
-                progress = int((frame_idx / total_frames) * 90) # Progress within the video
-                task.update_state(state='PROGRESS', meta={'status': f'Processing frame {frame_idx}/{total_frames}', 'progress': progress})
-
-            # Run detection on the frame
-            results = model(frame, verbose=False, conf=CONFIDENCE_THRESHOLD)
-
-            # Extract coordinates for detected wagons
-            current_detected_wagon_boxes_coords = []
-            if results and results[0].boxes:
-                for box_obj in results[0].boxes:
-                    conf = box_obj.conf.item()
-                    cls_id = int(box_obj.cls.item())
-
-                    if cls_id == WAGON_CLASS_ID and conf >= CONFIDENCE_THRESHOLD:
-                        current_detected_wagon_boxes_coords.append(box_obj.xyxy.cpu().numpy().flatten().tolist())
-
-            frame_buffer.append((frame.copy(), current_detected_wagon_boxes_coords))
-
-            if len(frame_buffer) == FRAME_BUFFER_SIZE:
-                num_current_wagon_boxes = len(current_detected_wagon_boxes_coords)
-                oldest_frame_img_in_buf, oldest_wagon_boxes_in_buf_coords = frame_buffer[0]
-                num_oldest_wagon_boxes_in_buf = len(oldest_wagon_boxes_in_buf_coords)
-
-                if current_capture_state == "SEARCHING_FOR_WAGON":
-                    if num_current_wagon_boxes == 1:
-                        current_capture_state = "SINGLE_WAGON_PASSING"
-                        potential_capture_frame_img = None
-                elif current_capture_state == "SINGLE_WAGON_PASSING":
-                    if num_current_wagon_boxes == 1:
-                        if num_oldest_wagon_boxes_in_buf == 1:
-                            potential_capture_frame_img = oldest_frame_img_in_buf.copy()
-                    else:
-                        if potential_capture_frame_img is not None:
-                            saved_frames.append(potential_capture_frame_img)
-                            saved_frame_count += 1
-                        potential_capture_frame_img = None
-                        current_capture_state = "SEARCHING_FOR_WAGON"
-
-        if current_capture_state == "SINGLE_WAGON_PASSING" and potential_capture_frame_img is not None:
-            saved_frames.append(potential_capture_frame_img)
-            saved_frame_count += 1
-
-        cap.release()
-        logger.info(f"Processing complete. Extracted {saved_frame_count} individual wagon frames.")
-        return saved_frame_count, saved_frames
\ No newline at end of file
+def reset_frame_extractor_cache():
+    """
+    Drop this thread's cached extractor. Runs in forked worker children so they
+    load their own model instead of using one inherited from the parent.
+    """
+    _extractor_cache.extractor = None
@@ -0,0 +1,81 @@
+"""
+Preallocated storage for decoded video frames.
+
+Frames are decoded straight into slots of one contiguous NumPy array and
+handed between stages by slot index, so the hot loop never allocates or
+copies full-resolution images.
+"""
+import collections
+import threading
+import numpy as np
+
+
+class FramePool:
+    """
+    A fixed number of reference-counted frame slots.
+
+    The backing array of shape [num_slots, H, W, 3] is allocated when the first
+    frame is decoded, since the real frame size is only known then. A slot is
+    handed out with a reference count of one; holders that keep it around call
+    ``retain`` and every holder calls ``release`` once it is done. The slot is
+    reused when the count drops to zero.
+    """
+
+    def __init__(self, num_slots, poll_interval=0.1):
+        self.num_slots = max(1, int(num_slots))
+        self.poll_interval = poll_interval
+        self.frames = None
+        self._refcounts = [0] * self.num_slots
+        self._free = collections.deque(range(self.num_slots))
+        self._cond = threading.Condition()
+
+    def __getitem__(self, slot):
+        return self.frames[slot]
+
+    def acquire(self, cancel=None):
+        """Take a free slot, blocking until one is released. Returns None if ``cancel`` is set."""
+        with self._cond:
+            while not self._free:
+                if cancel is not None and cancel.is_set():
+                    return None
+                self._cond.wait(self.poll_interval)
+            slot = self._free.popleft()
+            self._refcounts[slot] = 1
+            return slot
+
+    def retain(self, slot):
+        with self._cond:
+            self._refcounts[slot] += 1
+
+    def release(self, slot):
+        with self._cond:
+            self._refcounts[slot] -= 1
+            if self._refcounts[slot] == 0:
+                self._free.append(slot)
+                self._cond.notify()
+
+    def read_into(self, cap, cancel=None):
+        """
+        Decode the next frame of ``cap`` directly into a free slot.
+        Returns the slot index, or None at the end of the video.
+        """
+        slot = self.acquire(cancel)
+        if slot is None:
+            return None
+
+        if self.frames is None:
+            ret, frame = cap.read()
+            if ret:
+                self.frames = np.empty((self.num_slots,) + frame.shape, dtype=frame.dtype)
+                self.frames[slot] = frame
+        else:
+            target = self.frames[slot]
+            ret, frame = cap.read(target)
+            # OpenCV only decodes in place when the buffer matches; copy otherwise
+            if ret and not np.shares_memory(frame, target):
+                target[...] = frame
+
+        if not ret:
+            self.release(slot)
+            return None
+        return slot
@@ -0,0 +1,124 @@
+"""
+Cheap motion gating in front of YOLO inference.
+
+Between rakes the camera watches an empty track for minutes at a time, and
+running the full detector on every one of those frames is wasted work.
+"""
+import os
+import copy
+import logging
+import cv2
+
+logger = logging.getLogger(__name__)
+
+# Mean absolute grayscale difference (0-255) above which a frame counts as moving
+DEFAULT_MOTION_THRESHOLD = float(os.getenv('MOTION_THRESHOLD', 3.0))
+# While searching, run inference at least every N frames even if nothing moves
+DEFAULT_MAX_STRIDE = int(os.getenv('MOTION_MAX_STRIDE', 10))
+# Keep inferring every frame for this many frames after a wagon was last seen
+DEFAULT_DENSE_FRAMES = int(os.getenv('MOTION_DENSE_FRAMES', 12))
+
+
+class MotionGate:
+    """
+    Decides which frames need a full detector pass.
+
+    Every frame is reduced to a small blurred grayscale thumbnail and compared
+    with the last frame that went through the model. While no wagon is in view,
+    static frames are skipped and only sampled every ``max_stride`` frames.
+    As soon as a wagon is detected, and for ``dense_frames`` frames after it was
+    last seen, every frame is inferred so the capture state machine sees each
+    transition at full rate.
+
+    Skipped frames reuse the boxes of the last inferred frame. Callers report
+    the frames they actually send to the detector through record_inferences(),
+    including any whose result the gate ends up not using.
+    """
+
+    def __init__(self, threshold=DEFAULT_MOTION_THRESHOLD, max_stride=DEFAULT_MAX_STRIDE,
+                 dense_frames=DEFAULT_DENSE_FRAMES, thumbnail_width=64):
+        self.threshold = threshold
+        self.max_stride = max(1, int(max_stride))
+        self.dense_frames = dense_frames
+        self.thumbnail_width = thumbnail_width
+
+        self.frames_seen = 0
+        self.selected = 0
+        self.inferences = 0
+        self.last_boxes = []
+        self._reference = None
+        self._since_inference = 0
+        self._dense_remaining = 0
+
+    def thumbnail(self, frame):
+        """The small blurred grayscale image frames are compared by."""
+        height, width = frame.shape[:2]
+        size = (self.thumbnail_width, max(1, int(height * self.thumbnail_width / width)))
+        small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (3, 3), 0)
+
+    def motion_score(self, thumbnail):
+        """Mean absolute difference against the last inferred frame."""
+        if self._reference is None:
+            return float('inf')
+        return float(cv2.absdiff(thumbnail, self._reference).mean())
+
+    def should_infer(self, frame, thumbnail=None):
+        """
+        Return True if ``frame`` must go through the detector. Frames have to
+        be passed in order, with observe() called after every inferred one.
+        """
+        self.frames_seen += 1
+        if thumbnail is None:
+            thumbnail = self.thumbnail(frame)
+
+        dense = self._dense_remaining > 0 or bool(self.last_boxes)
+        infer = (
+            dense
+            or self._since_inference + 1 >= self.max_stride
+            or self.motion_score(thumbnail) >= self.threshold
+        )
+
+        if infer:
+            self._reference = thumbnail
+            self._since_inference = 0
+            self.selected += 1
+        else:
+            self._since_inference += 1
+        if self._dense_remaining > 0:
+            self._dense_remaining -= 1
+        return infer
+
+    def lookahead(self, thumbnails):
+        """
+        Which of the next frames (given as thumbnails) would be inferred if the
+        detector output stayed as it is now. Leaves the gate unchanged.
+        """
+        probe = copy.copy(self)
+        return [probe.should_infer(None, thumbnail) for thumbnail in thumbnails]
+
+    def record_inferences(self, count):
+        """Count ``count`` frames sent to the detector."""
+        self.inferences += count
+
+    def observe(self, wagon_boxes):
+        """Record the detector output for the most recent inferred frame."""
+        self.last_boxes = wagon_boxes
+        if wagon_boxes:
+            self._dense_remaining = self.dense_frames
+
+    def report(self):
+        """
+        How many detector passes the gate saved so far. ``discarded`` counts
+        frames that went through the detector without the gate selecting them.
+        """
+        skipped = self.frames_seen - self.inferences
+        return {
+            'frames': self.frames_seen,
+            'inferences': self.inferences,
+            'discarded': self.inferences - self.selected,
+            'skipped': skipped,
+            'skipped_ratio': round(skipped / self.frames_seen, 3) if self.frames_seen else 0.0,
+        }
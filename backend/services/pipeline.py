@@ -0,0 +1,161 @@
+"""
+Threaded streaming pipeline used to overlap the stages of video processing.
+
+Each stage runs on its own thread and is connected to the next one by a
+bounded queue, so a slow stage applies back-pressure instead of letting
+frames pile up in memory.
+"""
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of a stage's output stream
+_END = object()
+
+
+class StageStats:
+    """Throughput counters for a single pipeline stage."""
+
+    def __init__(self, name):
+        self.name = name
+        self.items_in = 0
+        self.items_out = 0
+        self.wait_in_seconds = 0.0   # starved, waiting on the upstream stage
+        self.wait_out_seconds = 0.0  # blocked, waiting on the downstream stage
+        self.wall_seconds = 0.0
+
+    @property
+    def busy_seconds(self):
+        return max(0.0, self.wall_seconds - self.wait_in_seconds - self.wait_out_seconds)
+
+    def as_dict(self):
+        busy = self.busy_seconds
+        return {
+            'stage': self.name,
+            'items_in': self.items_in,
+            'items_out': self.items_out,
+            'busy_seconds': round(busy, 3),
+            'wall_seconds': round(self.wall_seconds, 3),
+            'utilization': round(busy / self.wall_seconds, 3) if self.wall_seconds else 0.0,
+            'items_per_second': round(self.items_out / busy, 2) if busy else 0.0,
+        }
+
+
+class Pipeline:
+    """
+    A chain of generator stages running on separate threads.
+
+    Every stage is a callable. The first one takes no arguments, the others
+    receive an iterator over the previous stage's outputs. Each yields its
+    own outputs, which are handed downstream through a bounded queue.
+    """
+
+    def __init__(self, name='pipeline', poll_interval=0.1):
+        self.name = name
+        self.poll_interval = poll_interval
+        self.stats = []
+        self._stages = []
+        self._errors = []
+        self._stop = threading.Event()
+
+    @property
+    def stop_event(self):
+        """Set once the pipeline is shutting down, e.g. after a stage failed."""
+        return self._stop
+
+    def add_stage(self, name, func, queue_size=4):
+        """Append a stage whose output queue holds at most ``queue_size`` items."""
+        self._stages.append((name, func, max(1, int(queue_size))))
+        return self
+
+    def run(self):
+        """
+        Start all stages and yield the outputs of the last one.
+        Re-raises the first exception raised by any stage.
+        """
+        queues = [queue.Queue(maxsize=size) for _, _, size in self._stages]
+        self.stats = [StageStats(name) for name, _, _ in self._stages]
+
+        threads = []
+        for i, (name, func, _) in enumerate(self._stages):
+            inbox = queues[i - 1] if i > 0 else None
+            thread = threading.Thread(
+                target=self._run_stage,
+                args=(func, inbox, queues[i], self.stats[i]),
+                name=f"{self.name}-{name}",
+                daemon=True,
+            )
+            threads.append(thread)
+
+        for thread in threads:
+            thread.start()
+        try:
+            yield from self._drain(queues[-1])
+        finally:
+            # Also unblocks the stages if the consumer stopped iterating early
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+
+        if self._errors:
+            raise self._errors[0]
+
+    def stats_summary(self):
+        """Per-stage throughput as a list of dicts, in pipeline order."""
+        return [stats.as_dict() for stats in self.stats]
+
+    def log_stats(self):
+        for stats in self.stats_summary():
+            logger.info(
+                f"[{self.name}] {stats['stage']}: {stats['items_out']} items, "
+                f"{stats['items_per_second']} items/s, utilization {stats['utilization']:.0%}"
+            )
+
+    def _run_stage(self, func, inbox, outbox, stats):
+        start = time.perf_counter()
+        try:
+            outputs = func(self._drain(inbox, stats)) if inbox is not None else func()
+            for item in outputs:
+                stats.items_out += 1
+                if not self._put(outbox, item, stats):
+                    break
+        except Exception as e:
+            logger.error(f"[{self.name}] stage failed: {e}", exc_info=True)
+            self._errors.append(e)
+            self._stop.set()
+        finally:
+            stats.wall_seconds = time.perf_counter() - start
+            self._put(outbox, _END)
+
+    def _put(self, q, item, stats=None):
+        started = time.perf_counter()
+        try:
+            while not self._stop.is_set():
+                try:
+                    q.put(item, timeout=self.poll_interval)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        finally:
+            if stats is not None:
+                stats.wait_out_seconds += time.perf_counter() - started
+
+    def _drain(self, q, stats=None):
+        while not self._stop.is_set():
+            started = time.perf_counter()
+            try:
+                item = q.get(timeout=self.poll_interval)
+            except queue.Empty:
+                continue
+            finally:
+                if stats is not None:
+                    stats.wait_in_seconds += time.perf_counter() - started
+            if item is _END:
+                return
+            if stats is not None:
+                stats.items_in += 1
+            yield item
@@ -0,0 +1,36 @@
+"""
+Shared Redis connection for the caches and stores that live next to the
+Celery broker.
+"""
+import os
+import logging
+import threading
+import redis
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv('REDIS_URL', os.getenv('CELERY_RESULT_BACKEND', 'redis://redis:6379/0'))
+
+_redis_client = None
+_redis_client_lock = threading.Lock()
+
+
+def get_redis_client():
+    """Return the process-wide Redis client (connections are pooled and created lazily)."""
+    global _redis_client
+    if _redis_client is None:
+        with _redis_client_lock:
+            if _redis_client is None:
+                _redis_client = redis.Redis.from_url(REDIS_URL, socket_timeout=2, socket_connect_timeout=2)
+    return _redis_client
+
+
+def reset_redis_client():
+    """Drop the cached client, e.g. in a forked child process."""
+    global _redis_client, _redis_client_lock
+    _redis_client = None
+    _redis_client_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=reset_redis_client)
@@ -0,0 +1,360 @@
+"""
+Streaming access to S3 videos: byte-range GETs for reading and multipart
+uploads for writing.
+
+Lets the decoder start on the first chunk of a video instead of waiting for
+the whole object to be downloaded to temp_downloads, and lets uploads be
+forwarded to S3 while the request body is still arriving.
+"""
+import os
+import io
+import uuid
+import errno
+import struct
+import logging
+import threading
+import contextlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from botocore.exceptions import ClientError
+
+from .s3_utils import get_s3_client
+
+logger = logging.getLogger(__name__)
+
+# Size of each ranged GET and how many chunks are fetched ahead of the reader
+DEFAULT_CHUNK_SIZE = int(os.getenv('S3_STREAM_CHUNK_SIZE', 8 * 1024 * 1024))
+DEFAULT_READ_AHEAD = int(os.getenv('S3_STREAM_READ_AHEAD', 4))
+# Size of each part of a streamed upload and how many parts upload at once
+DEFAULT_PART_SIZE = int(os.getenv('S3_UPLOAD_PART_SIZE', 16 * 1024 * 1024))
+DEFAULT_PART_WORKERS = int(os.getenv('S3_UPLOAD_PART_WORKERS', 4))
+# S3 rejects smaller parts, except for the last one
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+class S3RangeReader(io.RawIOBase):
+    """
+    Read-only, seekable file object over an S3 object.
+
+    The object is fetched in fixed-size chunks with ranged GETs. Whenever a
+    chunk is read, the next ``read_ahead`` chunks are requested in the
+    background, so sequential readers rarely wait on the network. Only the
+    chunks around the current position are kept in memory. Every GET is
+    conditional on the ETag seen when the reader was opened.
+    """
+
+    def __init__(self, bucket_name, s3_key, chunk_size=DEFAULT_CHUNK_SIZE, read_ahead=DEFAULT_READ_AHEAD,
+                 s3_client=None):
+        super().__init__()
+        self.bucket_name = bucket_name
+        self.s3_key = s3_key
+        self.chunk_size = max(1, int(chunk_size))
+        self.read_ahead = max(0, int(read_ahead))
+        self._client = s3_client or get_s3_client()
+        if self._client is None:
+            raise RuntimeError("S3 client initialization failed")
+
+        head = self._client.head_object(Bucket=bucket_name, Key=s3_key)
+        self.size = head['ContentLength']
+        self.etag = head['ETag']
+
+        self._pos = 0
+        self._chunks = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, self.read_ahead), thread_name_prefix='s3-read-ahead')
+
+    def _fetch(self, index):
+        start = index * self.chunk_size
+        end = min(self.size, start + self.chunk_size) - 1
+        response = self._client.get_object(
+            Bucket=self.bucket_name,
+            Key=self.s3_key,
+            Range=f"bytes={start}-{end}",
+            IfMatch=self.etag,
+        )
+        return response['Body'].read()
+
+    def _chunk(self, index):
+        last_index = (self.size - 1) // self.chunk_size
+        with self._lock:
+            for i in range(index, min(last_index, index + self.read_ahead) + 1):
+                if i not in self._chunks:
+                    self._chunks[i] = self._executor.submit(self._fetch, i)
+            # Keep the previous chunk for small backward seeks, drop everything else
+            for i in list(self._chunks):
+                if i < index - 1 or i > index + self.read_ahead:
+                    self._chunks.pop(i).cancel()
+            future = self._chunks[index]
+        return future.result()
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._pos + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        if position < 0:
+            raise ValueError("Negative seek position")
+        self._pos = position
+        return self._pos
+
+    def readinto(self, buffer):
+        if self.closed:
+            raise ValueError("I/O operation on closed file")
+        if self._pos >= self.size:
+            return 0
+
+        index, offset = divmod(self._pos, self.chunk_size)
+        data = self._chunk(index)
+        count = min(len(buffer), len(data) - offset)
+        buffer[:count] = memoryview(data)[offset:offset + count]
+        self._pos += count
+        return count
+
+    def close(self):
+        if not self.closed:
+            with self._lock:
+                for future in self._chunks.values():
+                    future.cancel()
+                self._chunks.clear()
+            self._executor.shutdown(wait=False)
+        super().close()
+
+
+def _read_exactly(reader, size):
+    """Read ``size`` bytes, or fewer only at the end of the object."""
+    data = b''
+    while len(data) < size:
+        chunk = reader.read(size - len(data))
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+
+def is_sequentially_decodable(reader, s3_key):
+    """
+    Return True if the video can be decoded from a non-seekable stream.
+
+    MP4/MOV files only qualify when the 'moov' index comes before the media
+    data ("fast start"). Other containers are assumed to be streamable.
+    """
+    if not s3_key.lower().endswith(('.mp4', '.mov', '.m4v')):
+        return True
+
+    offset = 0
+    try:
+        while offset + 8 <= reader.size:
+            reader.seek(offset)
+            # A read can stop at a chunk boundary
+            header = _read_exactly(reader, 16)
+            if len(header) < 8:
+                return False
+            box_size, box_type = struct.unpack('>I4s', header[:8])
+            if box_size == 1:
+                if len(header) < 16:
+                    return False
+                box_size = struct.unpack('>Q', header[8:16])[0]
+            elif box_size == 0:
+                box_size = reader.size - offset
+
+            if box_type == b'moov':
+                return True
+            if box_type == b'mdat' or box_size < 8:
+                return False
+            offset += box_size
+        return False
+    finally:
+        reader.seek(0)
+
+
+class StreamFailed(IOError):
+    """The S3 stream feeding a FIFO stopped before the end of the object."""
+
+
+def _pump_to_fifo(reader, fifo_path, stop, failures):
+    try:
+        with open(fifo_path, 'wb') as fifo:
+            try:
+                while not stop.is_set():
+                    data = reader.read(reader.chunk_size)
+                    if not data:
+                        break
+                    fifo.write(data)
+            except BrokenPipeError:
+                raise
+            except Exception as e:
+                # Recorded before the FIFO is closed, so a decoder that sees its
+                # end can already tell a failed stream from the end of the video
+                failures.append(e)
+                logger.error(f"Error streaming {reader.s3_key} from S3: {e}")
+    except BrokenPipeError:
+        # The decoder closed its end before the end of the video
+        pass
+
+
+@contextlib.contextmanager
+def s3_video_fifo(bucket_name, s3_key, temp_dir, chunk_size=DEFAULT_CHUNK_SIZE, read_ahead=DEFAULT_READ_AHEAD):
+    """
+    Expose an S3 video as a named pipe fed by ranged GETs with read-ahead.
+
+    Yields (FIFO path to hand to the decoder, check), or (None, None) if the
+    object can not be streamed (missing, or an MP4 without fast start), in
+    which case the caller should fall back to a full download.
+
+    A failed ranged GET ends the FIFO early, which a decoder can not tell from
+    the end of the video. ``check()`` raises StreamFailed if that happened;
+    call it once the decoder has reached the end. Leaving the block without
+    an exception runs it as well.
+    """
+    try:
+        reader = S3RangeReader(bucket_name, s3_key, chunk_size=chunk_size, read_ahead=read_ahead)
+    except (ClientError, RuntimeError) as e:
+        logger.error(f"Could not open {s3_key} for streaming: {e}")
+        yield None, None
+        return
+
+    try:
+        if not is_sequentially_decodable(reader, s3_key):
+            logger.info(f"{s3_key} is not stored with fast start; it has to be downloaded first.")
+            yield None, None
+            return
+
+        fifo_path = os.path.join(temp_dir, f"{uuid.uuid4().hex}.fifo")
+        os.mkfifo(fifo_path)
+        stop = threading.Event()
+        failures = []
+
+        def check():
+            if failures:
+                raise StreamFailed(f"Streaming {s3_key} from S3 failed: {failures[0]}") from failures[0]
+
+        writer = threading.Thread(target=_pump_to_fifo, args=(reader, fifo_path, stop, failures), daemon=True)
+        writer.start()
+        try:
+            yield fifo_path, check
+        finally:
+            stop.set()
+            # Let the writer out of open() or a blocked write if the decoder went away early
+            try:
+                fd = os.open(fifo_path, os.O_RDONLY | os.O_NONBLOCK)
+                while writer.is_alive():
+                    try:
+                        if not os.read(fd, 1024 * 1024):
+                            break
+                    except OSError as e:
+                        if e.errno != errno.EAGAIN:
+                            raise
+                        writer.join(0.05)
+                os.close(fd)
+            except OSError:
+                pass
+            writer.join()
+            os.remove(fifo_path)
+        check()
+    finally:
+        reader.close()
+
+
+class S3MultipartWriter:
+    """
+    Write-only file object that streams into an S3 multipart upload.
+
+    Written data is cut into ``part_size`` parts, which are uploaded in the
+    background while more data arrives. write() blocks while ``max_workers``
+    parts are in flight, so at most about ``max_workers + 1`` parts are held in
+    memory. Call complete() after the last write, or abort() to discard the
+    upload; nothing is visible at ``s3_key`` until complete() succeeds.
+    """
+
+    def __init__(self, bucket_name, s3_key, content_type=None, part_size=DEFAULT_PART_SIZE,
+                 max_workers=DEFAULT_PART_WORKERS, s3_client=None):
+        self.bucket_name = bucket_name
+        self.s3_key = s3_key
+        self.part_size = max(MIN_PART_SIZE, int(part_size))
+        self.max_workers = max(1, int(max_workers))
+        self._client = s3_client or get_s3_client()
+        if self._client is None:
+            raise RuntimeError("S3 client initialization failed")
+
+        extra_args = {'ContentType': content_type} if content_type else {}
+        self.upload_id = self._client.create_multipart_upload(Bucket=bucket_name, Key=s3_key, **extra_args)['UploadId']
+        self.size = 0
+
+        self._buffer = bytearray()
+        self._parts = []
+        self._pending = deque()
+        self._slots = threading.Semaphore(self.max_workers)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='s3-upload-part')
+
+    def _upload_part(self, part_number, data):
+        try:
+            response = self._client.upload_part(
+                Bucket=self.bucket_name,
+                Key=self.s3_key,
+                UploadId=self.upload_id,
+                PartNumber=part_number,
+                Body=data,
+            )
+            return {'PartNumber': part_number, 'ETag': response['ETag']}
+        finally:
+            self._slots.release()
+
+    def _collect(self, wait=False):
+        # Raises the error of a failed part on the writer's thread
+        while self._pending and (wait or self._pending[0].done()):
+            self._parts.append(self._pending.popleft().result())
+
+    def _submit_part(self, data):
+        self._slots.acquire()
+        part_number = len(self._parts) + len(self._pending) + 1
+        self._pending.append(self._executor.submit(self._upload_part, part_number, data))
+        self._collect()
+
+    def write(self, data):
+        self._buffer += data
+        self.size += len(data)
+        while len(self._buffer) >= self.part_size:
+            self._submit_part(bytes(self._buffer[:self.part_size]))
+            del self._buffer[:self.part_size]
+        return len(data)
+
+    def complete(self):
+        """Upload the last part and assemble the object."""
+        try:
+            if self._buffer or not (self._parts or self._pending):
+                self._submit_part(bytes(self._buffer))
+                self._buffer = bytearray()
+            self._collect(wait=True)
+        finally:
+            self._executor.shutdown()
+        self._client.complete_multipart_upload(
+            Bucket=self.bucket_name,
+            Key=self.s3_key,
+            UploadId=self.upload_id,
+            MultipartUpload={'Parts': self._parts},
+        )
+        logger.info(f"Uploaded {self.size} bytes to {self.s3_key} in {len(self._parts)} parts")
+
+    def abort(self):
+        """Discard the upload and the parts stored so far."""
+        for future in self._pending:
+            future.cancel()
+        self._executor.shutdown()
+        try:
+            self._client.abort_multipart_upload(Bucket=self.bucket_name, Key=self.s3_key, UploadId=self.upload_id)
+        except ClientError as e:
+            # The bucket's lifecycle rules clean up abandoned uploads
+            logger.warning(f"Could not abort the upload of {self.s3_key}: {e}")
@@ -2,60 +2,131 @@
 S3 Utility functions for wagon damage detection application.
 """
 import os
+import io
+import time
 import boto3
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config as BotoConfig
 from botocore.exceptions import ClientError
-from werkzeug.utils import secure_filename
-from collections import defaultdict
+from collections import OrderedDict, deque
+
+from .video_index import video_index
 
 logger = logging.getLogger(__name__)
 
-def get_s3_client():
-    """Initialize and return an S3 client using environment variables."""
-    try:
-        s3_client = boto3.client(
-            's3',
-            aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
-            aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
-            region_name=os.getenv('AWS_REGION', 'us-east-1')
+# Connection pool and retry settings shared by every S3 call in the process.
+# This is the only retry layer: callers make a single call per operation.
+S3_MAX_POOL_CONNECTIONS = int(os.getenv('S3_MAX_POOL_CONNECTIONS', 32))
+S3_MAX_ATTEMPTS = int(os.getenv('S3_MAX_ATTEMPTS', 5))
+S3_RETRY_MODE = os.getenv('S3_RETRY_MODE', 'adaptive')
+
+# Bulk uploads: worker threads and the size above which an object goes
+# through a multipart transfer instead of a single PUT
+S3_UPLOAD_WORKERS = int(os.getenv('S3_UPLOAD_WORKERS', 8))
+S3_MULTIPART_THRESHOLD = int(os.getenv('S3_MULTIPART_THRESHOLD', 16 * 1024 * 1024))
+S3_MULTIPART_CHUNKSIZE = int(os.getenv('S3_MULTIPART_CHUNKSIZE', 8 * 1024 * 1024))
+
+# Presigned URLs are reused while they stay valid for at least this long
+PRESIGNED_URL_MIN_REMAINING_SECONDS = int(os.getenv('PRESIGNED_URL_MIN_REMAINING_SECONDS', 300))
+PRESIGNED_URL_CACHE_SIZE = int(os.getenv('PRESIGNED_URL_CACHE_SIZE', 10000))
+
+_s3_clients = {}
+_s3_clients_lock = threading.Lock()
+
+
+def new_s3_client():
+    """Build a new S3 client from environment variables. Prefer get_s3_client()."""
+    return boto3.client(
+        's3',
+        aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
+        aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
+        region_name=os.getenv('AWS_REGION', 'us-east-1'),
+        config=BotoConfig(
+            max_pool_connections=S3_MAX_POOL_CONNECTIONS,
+            retries={'max_attempts': S3_MAX_ATTEMPTS, 'mode': S3_RETRY_MODE},
         )
+    )
+
+
+def get_s3_client():
+    """
+    Return the process-wide S3 client, creating it on first use.
+
+    boto3 clients are thread-safe, so one client (and its connection pool) is
+    shared by every thread. Clients are keyed by credentials and region so a
+    change in the environment still gets a matching client.
+    """
+    key = (os.getenv('AWS_ACCESS_KEY_ID'), os.getenv('AWS_SECRET_ACCESS_KEY'), os.getenv('AWS_REGION', 'us-east-1'))
+    s3_client = _s3_clients.get(key)
+    if s3_client is not None:
         return s3_client
-    except Exception as e:
-        logger.error(f"Error initializing S3 client: {str(e)}")
-        return None
 
-def get_s3_usage_stats(bucket_name, prefix=''):
+    with _s3_clients_lock:
+        s3_client = _s3_clients.get(key)
+        if s3_client is None:
+            try:
+                s3_client = new_s3_client()
+            except Exception as e:
+                logger.error(f"Error initializing S3 client: {str(e)}")
+                return None
+            _s3_clients[key] = s3_client
+        return s3_client
+
+
+def reset_s3_clients():
     """
-    Calculates total videos, storage size, and detected frames from an S3 bucket.
-    This is an efficient approach that gets all stats in a single pass.
+    Forget all cached clients. Must run in forked children (e.g. Celery prefork
+    workers) so they do not share the parent's open connections.
     """
-    s3_client = get_s3_client()
-    if not s3_client:
-        return {'total_videos': 0, 'total_size_bytes': 0, 'total_detections': 0}
+    global _s3_clients_lock
+    _s3_clients.clear()
+    # The lock may have been held by another thread at fork time
+    _s3_clients_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=reset_s3_clients)
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov')
+
+
+def is_raw_video_key(key):
+    key_lower = key.lower()
+    return '/raw-videos/' in key_lower and key_lower.endswith(VIDEO_EXTENSIONS)
 
-    paginator = s3_client.get_paginator('list_objects_v2')
-    pages = paginator.paginate(Bucket=bucket_name, Prefix=prefix)
 
+FRAME_EXTENSIONS = ('.jpg', '.webp')
+
+
+def is_extracted_frame_key(key):
+    key_lower = key.lower()
+    return (
+        ('/extracted_frames/' in key_lower or '/processed frames/' in key_lower)
+        and key_lower.endswith(FRAME_EXTENSIONS)
+        and '/thumbnails/' not in key_lower
+    )
+
+
+def scan_s3_usage_stats(bucket_name, prefix=''):
+    """
+    Calculates total videos, storage size, and detected frames with a full
+    listing of ``prefix``. Raises on S3 errors.
+    """
     total_videos = 0
     total_size_bytes = 0
     total_detections = 0
-    video_extensions = ('.mp4', '.avi', '.mov')
 
-    try:
-        for page in pages:
-            if 'Contents' in page:
-                for obj in page['Contents']:
-                    key_lower = obj['Key'].lower()
-                    # Count raw videos and their size
-                    if '/raw-videos/' in key_lower and key_lower.endswith(video_extensions):
-                        total_videos += 1
-                        total_size_bytes += obj['Size']
-                    # Count extracted frames (detections)
-                    elif '/extracted_frames/' in key_lower and key_lower.endswith('.jpg'):
-                        total_detections += 1
-    except ClientError as e:
-        logger.error(f"Error scanning S3 bucket for stats: {e}")
-        return {'total_videos': 0, 'total_size_bytes': 0, 'total_detections': 0}
+    for obj in iter_s3_objects(bucket_name, prefix):
+        # Count raw videos and their size
+        if is_raw_video_key(obj['Key']):
+            total_videos += 1
+            total_size_bytes += obj['Size']
+        # Count extracted frames (detections)
+        elif is_extracted_frame_key(obj['Key']):
+            total_detections += 1
 
     return {
         'total_videos': total_videos,
@@ -64,6 +135,18 @@ def get_s3_usage_stats(bucket_name, prefix=''):
     }
 
 
+def get_s3_usage_stats(bucket_name, prefix=''):
+    """
+    Calculates total videos, storage size, and detected frames from an S3 bucket.
+    This is an efficient approach that gets all stats in a single pass.
+    """
+    try:
+        return scan_s3_usage_stats(bucket_name, prefix)
+    except (ClientError, RuntimeError) as e:
+        logger.error(f"Error scanning S3 bucket for stats: {e}")
+        return {'total_videos': 0, 'total_size_bytes': 0, 'total_detections': 0}
+
+
 def upload_bytes_to_s3(image_bytes, bucket_name, s3_key, content_type='image/jpeg'):
     """Upload a bytes object to an S3 bucket."""
     try:
@@ -85,83 +168,227 @@ def upload_bytes_to_s3(image_bytes, bucket_name, s3_key, content_type='image/jpe
         logger.error(f"General error during bytes upload: {e}")
         return False, f"Error: {str(e)}"
 
+def _upload_object(s3_client, bucket_name, s3_key, data, content_type):
+    """
+    Upload one object. Retries, with backoff, are left to the client's retry
+    configuration (S3_MAX_ATTEMPTS, S3_RETRY_MODE) so they are not nested.
+    """
+    try:
+        if len(data) >= S3_MULTIPART_THRESHOLD:
+            s3_client.upload_fileobj(
+                io.BytesIO(data),
+                bucket_name,
+                s3_key,
+                ExtraArgs={'ContentType': content_type},
+                Config=TransferConfig(
+                    multipart_threshold=S3_MULTIPART_THRESHOLD,
+                    multipart_chunksize=S3_MULTIPART_CHUNKSIZE,
+                )
+            )
+        else:
+            s3_client.put_object(
+                Bucket=bucket_name,
+                Key=s3_key,
+                Body=data,
+                ContentType=content_type
+            )
+        return True, f"Successfully uploaded to {s3_key}"
+    except ClientError as e:
+        message = f"S3 error: {e.response['Error']['Message']}"
+    except Exception as e:
+        message = f"Error: {str(e)}"
+    logger.error(f"Failed to upload {s3_key}: {message}")
+    return False, message
+
+
+def iter_upload_to_s3(items, bucket_name, content_type='image/jpeg', max_workers=None):
+    """
+    Upload an iterable of (s3_key, bytes) items on a bounded thread pool. An
+    item can also be (s3_key, bytes, content_type) to override ``content_type``.
+
+    Yields a (s3_key, success, message) tuple per item, in input order. Items
+    are pulled lazily and at most ``max_workers`` uploads are in flight, so the
+    input can be a generator that is still producing data.
+    """
+    max_workers = max(1, max_workers or S3_UPLOAD_WORKERS)
+
+    s3_client = get_s3_client()
+    if s3_client is None:
+        for item in items:
+            yield item[0], False, "S3 client initialization failed"
+        return
+
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='s3-upload') as executor:
+        for item in items:
+            s3_key, data = item[:2]
+            item_content_type = item[2] if len(item) > 2 else content_type
+            future = executor.submit(_upload_object, s3_client, bucket_name, s3_key, data, item_content_type)
+            pending.append((s3_key, future))
+
+            while pending and (len(pending) > max_workers or pending[0][1].done()):
+                s3_key, future = pending.popleft()
+                yield (s3_key,) + future.result()
+
+        while pending:
+            s3_key, future = pending.popleft()
+            yield (s3_key,) + future.result()
+
+
+def upload_many_to_s3(items, bucket_name, content_type='image/jpeg', max_workers=None):
+    """Upload (s3_key, bytes) items concurrently; returns a list of (s3_key, success, message)."""
+    return list(iter_upload_to_s3(items, bucket_name, content_type=content_type, max_workers=max_workers))
+
+
+class PresignedUrlCache:
+    """
+    Bounded LRU cache of presigned URLs keyed on (bucket, key, expiration).
+
+    A cached URL is handed out again as long as it remains valid for at least
+    ``min_remaining`` seconds, so clients never get a URL about to expire.
+    """
+
+    def __init__(self, maxsize=PRESIGNED_URL_CACHE_SIZE, min_remaining=PRESIGNED_URL_MIN_REMAINING_SECONDS):
+        self.maxsize = maxsize
+        self.min_remaining = min_remaining
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, cache_key):
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None:
+                url, expires_at = entry
+                if expires_at - time.time() >= self.min_remaining:
+                    self._entries.move_to_end(cache_key)
+                    self.hits += 1
+                    return url
+                del self._entries[cache_key]
+            self.misses += 1
+            return None
+
+    def put(self, cache_key, url, expires_at):
+        with self._lock:
+            self._entries[cache_key] = (url, expires_at)
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries), 'maxsize': self.maxsize}
+
+
+_presigned_url_cache = PresignedUrlCache()
+
+
+def presigned_url_cache_stats():
+    """Hit/miss counters and size of the presigned URL cache."""
+    return _presigned_url_cache.stats()
+
+
 def generate_presigned_url(bucket_name, s3_key, expiration=3600):
-    """Generate a presigned URL to share an S3 object."""
+    """Generate a presigned URL to share an S3 object, reusing a cached one while it is still fresh."""
+    cache_key = (bucket_name, s3_key, expiration)
+    url = _presigned_url_cache.get(cache_key)
+    if url is not None:
+        return url
+
     try:
         s3_client = get_s3_client()
         if s3_client is None:
             return None
-        
+
+        # Take the timestamp before signing so the cached expiry is never optimistic
+        signed_at = time.time()
         url = s3_client.generate_presigned_url(
             'get_object',
             Params={'Bucket': bucket_name, 'Key': s3_key},
             ExpiresIn=expiration
         )
+        _presigned_url_cache.put(cache_key, url, signed_at + expiration)
         return url
     except ClientError as e:
         logger.error(f"Failed to generate presigned URL: {e}")
         return None
 
 
-def upload_file_to_s3(file, bucket_name, folder_path):
-    """Upload a file to S3 and return the S3 key."""
-    try:
-        s3_client = get_s3_client()
-        if s3_client is None:
-            return False, "S3 client initialization failed", None
-        
-        original_filename = secure_filename(file.filename)
-        s3_key = os.path.join(folder_path, original_filename).replace("\\", "/")
-        
-        logger.info(f"Uploading file to S3 key: {s3_key}")
-        
-        file.seek(0)
-        s3_client.put_object(
-            Bucket=bucket_name,
-            Key=s3_key,
-            Body=file,
-            ContentType=file.content_type
-        )
-        
-        logger.info(f"Successfully uploaded {original_filename} to S3.")
-        return True, f"File {original_filename} uploaded successfully.", s3_key
-        
-    except ClientError as e:
-        logger.error(f"S3 client error during upload: {e}")
-        return False, f"S3 error: {e.response['Error']['Message']}", None
-        
-    except Exception as e:
-        logger.error(f"General error during upload: {str(e)}")
-        return False, f"Error: {str(e)}", None
+def iter_s3_objects(bucket_name, prefix):
+    """Yield every object under ``prefix``, following list_objects_v2 pagination."""
+    s3_client = get_s3_client()
+    if s3_client is None:
+        raise RuntimeError("S3 client initialization failed")
+
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+        yield from page.get('Contents', [])
+
+
+def iter_videos_in_folder(bucket_name, prefix):
+    """Yield the file names stored under a folder prefix, page by page."""
+    for obj in iter_s3_objects(bucket_name, prefix):
+        key = obj['Key']
+        if not key.endswith('/'):
+            path_parts = key.split('/')
+            if len(path_parts) > 1:
+                yield path_parts[-1]
+
+
+def raw_video_folder(base_folder, date_str, client_name, camera_angle, video_type):
+    """The S3 folder /s3-upload writes raw videos to, without a trailing slash."""
+    return os.path.join(
+        base_folder,
+        date_str,
+        client_name,
+        'Raw-videos',
+        camera_angle,
+        video_type
+    ).replace("\\", "/")
+
+
+def processed_frames_folder(base_folder, date_str, client_name, camera_angle, video_type):
+    """The S3 folder processing writes the frames of a raw video folder to, one subfolder per video."""
+    return os.path.join(
+        base_folder,
+        date_str,
+        client_name,
+        'Processed Frames',
+        camera_angle,
+        video_type
+    ).replace("\\", "/")
+
+
+def list_videos_in_folder(bucket_name, prefix, use_index=True):
+    """
+    Lists videos in a given S3 folder prefix.
+    Results are served from the video index when possible; pass use_index=False to force a listing.
+    """
+    if use_index:
+        cached = video_index.get(prefix)
+        if cached is not None:
+            return True, cached
 
-def list_videos_in_folder(bucket_name, prefix):
-    """Lists videos in a given S3 folder prefix."""
     try:
-        s3_client = get_s3_client()
-        if s3_client is None:
-            return False, "S3 client initialization failed"
+        video_names = list(iter_videos_in_folder(bucket_name, prefix))
 
-        response = s3_client.list_objects_v2(Bucket=bucket_name, Prefix=prefix)
-        
-        if 'Contents' not in response:
-            return True, []
-
-        folder_dict = defaultdict(lambda: {'id': '', 'name': '', 'videos': []})
-
-        for obj in response['Contents']:
-            key = obj['Key']
-            if not key.endswith('/'):
-                path_parts = key.split('/')
-                if len(path_parts) > 1:
-                    video_name = path_parts[-1]
-                    folder_name = prefix
-                    
-                    folder_id = prefix.strip('/').replace('/', '-')
-                    folder_dict[folder_id]['id'] = folder_id
-                    folder_dict[folder_id]['name'] = folder_name
-                    folder_dict[folder_id]['videos'].append(video_name)
-
-        return True, list(folder_dict.values())
+        folders = []
+        if video_names:
+            folders.append({
+                'id': prefix.strip('/').replace('/', '-'),
+                'name': prefix,
+                'videos': video_names,
+            })
+
+        video_index.set(prefix, folders)
+        return True, folders
 
     except ClientError as e:
         logger.error(f"S3 client error listing videos: {e}")
@@ -0,0 +1,84 @@
+"""
+Materialized usage statistics for /system-status.
+
+Counters live in a Redis hash. The upload route and the Celery task bump them
+as they write objects, and a periodic reconcile replaces them with the result
+of a full S3 scan, so /system-status reads them in O(1) instead of listing the
+whole upload folder.
+"""
+import os
+import time
+import logging
+import redis
+
+from .redis_utils import get_redis_client
+from .s3_utils import scan_s3_usage_stats
+
+logger = logging.getLogger(__name__)
+
+USAGE_STATS_KEY = 'usage-stats'
+STATS_FIELDS = ('total_videos', 'total_size_bytes', 'total_detections')
+# How often the Celery beat schedule rescans S3 to correct drift
+STATS_RECONCILE_INTERVAL_SECONDS = int(os.getenv('STATS_RECONCILE_INTERVAL_SECONDS', 3600))
+
+
+def _increment(**deltas):
+    try:
+        pipe = get_redis_client().pipeline()
+        for field, delta in deltas.items():
+            pipe.hincrby(USAGE_STATS_KEY, field, delta)
+        pipe.hset(USAGE_STATS_KEY, 'updated_at', time.time())
+        pipe.execute()
+    except redis.RedisError as e:
+        # The next reconcile picks the change up
+        logger.warning(f"Could not update usage stats: {e}")
+
+
+def record_video_upload(size_bytes):
+    """Count one raw video of ``size_bytes`` bytes."""
+    _increment(total_videos=1, total_size_bytes=int(size_bytes or 0))
+
+
+def record_frames_extracted(count):
+    """Count ``count`` newly uploaded wagon frames."""
+    if count:
+        _increment(total_detections=int(count))
+
+
+def get_usage_stats():
+    """
+    Return the stored counters with their 'updated_at' and 'reconciled_at'
+    timestamps, or None if the store was never populated or is unreachable.
+    """
+    try:
+        stored = get_redis_client().hgetall(USAGE_STATS_KEY)
+    except redis.RedisError as e:
+        logger.warning(f"Could not read usage stats: {e}")
+        return None
+
+    stored = {key.decode(): value.decode() for key, value in stored.items()}
+    if 'reconciled_at' not in stored:
+        return None
+
+    stats = {field: int(stored.get(field, 0)) for field in STATS_FIELDS}
+    stats['updated_at'] = float(stored.get('updated_at', stored['reconciled_at']))
+    stats['reconciled_at'] = float(stored['reconciled_at'])
+    return stats
+
+
+def reconcile_usage_stats(bucket_name, prefix):
+    """
+    Recount everything under ``prefix`` and overwrite the stored counters.
+    Increments that land while the scan runs may be lost; the next reconcile
+    corrects them.
+    """
+    stats = scan_s3_usage_stats(bucket_name, prefix)
+    now = time.time()
+    stats['updated_at'] = now
+    stats['reconciled_at'] = now
+    try:
+        get_redis_client().hset(USAGE_STATS_KEY, mapping=stats)
+    except redis.RedisError as e:
+        logger.warning(f"Could not store reconciled usage stats: {e}")
+    logger.info(f"Reconciled usage stats for {prefix}: {stats}")
+    return stats
@@ -0,0 +1,144 @@
+"""
+Bookkeeping for tasks that fan out into per-video subtasks.
+
+The coordinator registers its children here, and every child records its own
+progress, so the parent's progress and cancellation can be derived from the
+children while the frontend keeps talking to the parent task id only.
+
+Progress changes are also published on a Redis pub/sub channel per parent task,
+which the /task-events stream relays to browsers.
+"""
+import os
+import json
+import time
+import logging
+import threading
+import redis
+
+from .redis_utils import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# Bookkeeping outlives any reasonable job, then cleans itself up
+FAN_OUT_TTL_SECONDS = 24 * 3600
+# Upper bound on progress writes per running video task
+PROGRESS_UPDATES_PER_SECOND = float(os.getenv('PROGRESS_UPDATES_PER_SECOND', 2))
+
+
+def _children_key(parent_id):
+    return f"task-children:{parent_id}"
+
+
+def _progress_key(parent_id):
+    return f"task-progress:{parent_id}"
+
+
+def _events_channel(task_id):
+    return f"task-events:{task_id}"
+
+
+def register_child_tasks(parent_id, child_ids):
+    pipe = get_redis_client().pipeline()
+    pipe.delete(_children_key(parent_id), _progress_key(parent_id))
+    pipe.rpush(_children_key(parent_id), *child_ids)
+    pipe.hset(_progress_key(parent_id), mapping={child_id: 0 for child_id in child_ids})
+    pipe.expire(_children_key(parent_id), FAN_OUT_TTL_SECONDS)
+    pipe.expire(_progress_key(parent_id), FAN_OUT_TTL_SECONDS)
+    pipe.execute()
+
+
+def get_child_task_ids(parent_id):
+    """Ids of the subtasks spawned for ``parent_id`` (empty if it never fanned out)."""
+    try:
+        return [child_id.decode() for child_id in get_redis_client().lrange(_children_key(parent_id), 0, -1)]
+    except redis.RedisError as e:
+        logger.warning(f"Could not look up subtasks of {parent_id}: {e}")
+        return []
+
+
+def record_child_progress(parent_id, child_id, progress):
+    """
+    Store a child's progress (0-100) and return the parent's overall progress
+    as (percent, finished_children, total_children), or None if Redis failed.
+    """
+    try:
+        pipe = get_redis_client().pipeline()
+        pipe.hset(_progress_key(parent_id), child_id, int(progress))
+        pipe.hvals(_progress_key(parent_id))
+        _, values = pipe.execute()
+    except redis.RedisError as e:
+        logger.warning(f"Could not record progress of {child_id}: {e}")
+        return None
+
+    progresses = [int(value) for value in values]
+    if not progresses:
+        return 0, 0, 0
+    overall = int(sum(progresses) / len(progresses))
+    finished = sum(1 for value in progresses if value >= 100)
+    return overall, finished, len(progresses)
+
+
+def publish_task_event(task_id, state, **fields):
+    """Publish a task's state and changed progress fields to its event channel."""
+    try:
+        get_redis_client().publish(_events_channel(task_id), json.dumps(dict(fields, state=state)))
+    except redis.RedisError as e:
+        # Subscribers also re-check the result backend periodically
+        logger.warning(f"Could not publish progress of {task_id}: {e}")
+
+
+def subscribe_task_events(task_id):
+    """A PubSub subscribed to ``task_id``'s events; the caller closes it."""
+    pubsub = get_redis_client().pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(_events_channel(task_id))
+    return pubsub
+
+
+def clear_child_tasks(parent_id):
+    try:
+        get_redis_client().delete(_children_key(parent_id), _progress_key(parent_id))
+    except redis.RedisError as e:
+        logger.warning(f"Could not clear subtask bookkeeping of {parent_id}: {e}")
+
+
+class ThrottledProgress:
+    """
+    Coalesces progress reports and passes at most ``max_rate`` per second on to
+    ``publish(progress, status)``. Reports that do not change the progress are
+    dropped; the latest one held back is published by flush(), which callers
+    invoke when a stage or the video ends. Safe to call from pipeline threads.
+    """
+
+    def __init__(self, publish, max_rate=PROGRESS_UPDATES_PER_SECOND):
+        self.publish = publish
+        self.min_interval = 1.0 / max_rate if max_rate > 0 else 0.0
+        self.published = 0
+        self._lock = threading.Lock()
+        self._last_time = None
+        self._last_progress = None
+        self._pending = None
+
+    def _take(self, progress, status, force):
+        with self._lock:
+            now = time.monotonic()
+            if not force:
+                if progress == self._last_progress:
+                    return False
+                if self._last_time is not None and now - self._last_time < self.min_interval:
+                    self._pending = (progress, status)
+                    return False
+            self._pending = None
+            self._last_time = now
+            self._last_progress = progress
+            self.published += 1
+            return True
+
+    def __call__(self, progress, status=None, force=False):
+        if self._take(progress, status, force):
+            self.publish(progress, status)
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, None
+        if pending is not None:
+            self(*pending, force=True)
@@ -0,0 +1,76 @@
+"""
+Cache of verified JWT claims.
+
+token_required runs on every authenticated request, including /task-status
+polling; with this cache a token's signature is verified once and its claims
+are reused until the token expires or the cache TTL runs out.
+"""
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 1024))
+# Claims are verified again at least this often, even for long-lived tokens
+TOKEN_CACHE_TTL_SECONDS = float(os.getenv('TOKEN_CACHE_TTL_SECONDS', 300))
+
+
+def token_digest(token):
+    return hashlib.sha256(token.encode('utf-8')).digest()
+
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU cache of decoded token claims keyed on the token's SHA-256.
+
+    An entry is dropped at the token's ``exp`` or ``ttl`` seconds after it
+    was verified, whichever comes first. Only verified tokens are stored.
+    """
+
+    def __init__(self, maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL_SECONDS):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token):
+        """The claims of a previously verified, unexpired token, or None."""
+        cache_key = token_digest(token)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None:
+                claims, expires_at = entry
+                if time.time() < expires_at:
+                    self._entries.move_to_end(cache_key)
+                    self.hits += 1
+                    return dict(claims)
+                del self._entries[cache_key]
+            self.misses += 1
+            return None
+
+    def put(self, token, claims):
+        cache_key = token_digest(token)
+        expires_at = time.time() + self.ttl
+        if 'exp' in claims:
+            expires_at = min(expires_at, claims['exp'])
+        with self._lock:
+            self._entries[cache_key] = (dict(claims), expires_at)
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries), 'maxsize': self.maxsize}
+
+
+verified_token_cache = VerifiedTokenCache()
@@ -0,0 +1,86 @@
+"""
+Index of raw video folders, so repeated retrievals are answered without
+listing S3 again.
+
+Folders are the prefixes written by /s3-upload:
+<base>/<date>/<client>/Raw-videos/<camera angle>/<video type>/
+"""
+import os
+import json
+import time
+import logging
+import threading
+import redis
+
+from .redis_utils import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# 'redis' shares the index between API processes and workers; 'memory' keeps it per process
+VIDEO_INDEX_BACKEND = os.getenv('VIDEO_INDEX_BACKEND', 'redis')
+# Entries also expire, which bounds staleness for objects written outside /s3-upload
+VIDEO_INDEX_TTL_SECONDS = int(os.getenv('VIDEO_INDEX_TTL_SECONDS', 600))
+VIDEO_INDEX_KEY_PREFIX = 'video-index:'
+
+
+def video_folder_key(prefix):
+    """Normalise a folder prefix so 'a/b' and 'a/b/' share one index entry."""
+    return prefix.strip('/')
+
+
+class MemoryVideoIndex:
+    def __init__(self, ttl=VIDEO_INDEX_TTL_SECONDS):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, prefix):
+        with self._lock:
+            entry = self._entries.get(video_folder_key(prefix))
+            if entry is None or entry[1] < time.time():
+                return None
+            return entry[0]
+
+    def set(self, prefix, folders):
+        with self._lock:
+            self._entries[video_folder_key(prefix)] = (folders, time.time() + self.ttl)
+
+    def invalidate(self, prefix):
+        with self._lock:
+            self._entries.pop(video_folder_key(prefix), None)
+
+
+class RedisVideoIndex:
+    """
+    Same interface as MemoryVideoIndex, stored in Redis. Redis errors are
+    logged and treated as a cache miss so listing still works without Redis.
+    """
+
+    def __init__(self, ttl=VIDEO_INDEX_TTL_SECONDS):
+        self.ttl = ttl
+
+    def _key(self, prefix):
+        return VIDEO_INDEX_KEY_PREFIX + video_folder_key(prefix)
+
+    def get(self, prefix):
+        try:
+            cached = get_redis_client().get(self._key(prefix))
+        except redis.RedisError as e:
+            logger.warning(f"Video index lookup failed: {e}")
+            return None
+        return json.loads(cached) if cached else None
+
+    def set(self, prefix, folders):
+        try:
+            get_redis_client().set(self._key(prefix), json.dumps(folders), ex=self.ttl)
+        except redis.RedisError as e:
+            logger.warning(f"Video index update failed: {e}")
+
+    def invalidate(self, prefix):
+        try:
+            get_redis_client().delete(self._key(prefix))
+        except redis.RedisError as e:
+            logger.warning(f"Video index invalidation failed: {e}")
+
+
+video_index = RedisVideoIndex() if VIDEO_INDEX_BACKEND == 'redis' else MemoryVideoIndex()
@@ -0,0 +1,161 @@
+"""
+Per-video result manifests, so rerunning a folder skips finished videos and
+resumes interrupted ones.
+
+A video's manifest is a JSON object stored next to its frames under
+'Processed Frames', at <output prefix>/manifest.json:
+
+    {"source_key": ..., "source_etag": ..., "status": "partial" | "complete",
+     "frames": [{"key": ..., "frame_idx": ..., "box": [x1, y1, x2, y2], "thumbnail": ...}, ...],
+     "resume_frame": ..., "updated_at": ...}
+
+``resume_frame`` is the frame at which the capture state machine committed
+the last recorded wagon; an interrupted run restarts there. A manifest only
+applies while the source object's ETag is unchanged. The manifests of a
+processed folder also serve as its gallery index (see list_video_manifests).
+"""
+import os
+import json
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from botocore.exceptions import ClientError
+
+from .s3_utils import get_s3_client, upload_bytes_to_s3
+from config import env_flag
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILENAME = 'manifest.json'
+# Skip videos with a complete manifest and resume partial ones
+RESUMABLE_PROCESSING_ENABLED = env_flag('RESUMABLE_PROCESSING_ENABLED', True)
+# Minimum time between manifest writes while a video is being processed
+MANIFEST_CHECKPOINT_SECONDS = float(os.getenv('MANIFEST_CHECKPOINT_SECONDS', 5))
+# Concurrent manifest reads when listing a folder
+MANIFEST_READ_WORKERS = int(os.getenv('MANIFEST_READ_WORKERS', 8))
+
+
+def manifest_key(output_prefix):
+    return os.path.join(output_prefix, MANIFEST_FILENAME).replace("\\", "/")
+
+
+def get_object_etag(bucket_name, s3_key):
+    """ETag of an S3 object, or None if it can not be read."""
+    try:
+        return get_s3_client().head_object(Bucket=bucket_name, Key=s3_key)['ETag']
+    except Exception as e:
+        logger.warning(f"Could not read the ETag of {s3_key}: {e}")
+        return None
+
+
+class VideoManifest:
+    """The frames produced so far for one source video, checkpointed to S3."""
+
+    def __init__(self, bucket_name, output_prefix, source_key, source_etag, status='partial', frames=None,
+                 resume_frame=0):
+        self.bucket_name = bucket_name
+        self.output_prefix = output_prefix
+        self.source_key = source_key
+        self.source_etag = source_etag
+        self.status = status
+        self.frames = list(frames or [])
+        self.resume_frame = resume_frame
+        self._last_saved = time.monotonic()
+
+    @classmethod
+    def load(cls, bucket_name, output_prefix, source_key, source_etag):
+        """
+        The stored manifest of ``source_key`` if it was written for the same
+        ETag, otherwise a fresh one. Frames from a different version of the
+        source are overwritten as the video is reprocessed.
+        """
+        manifest = cls(bucket_name, output_prefix, source_key, source_etag)
+        stored = read_manifest(bucket_name, output_prefix)
+        if stored is None:
+            return manifest
+
+        if source_etag is None or stored.get('source_etag') != source_etag:
+            logger.info(f"{source_key} changed since it was processed; starting over")
+            return manifest
+        manifest.status = stored.get('status', 'partial')
+        manifest.frames = stored.get('frames', [])
+        manifest.resume_frame = stored.get('resume_frame', 0)
+        return manifest
+
+    @property
+    def is_complete(self):
+        return self.status == 'complete'
+
+    @property
+    def frame_keys(self):
+        return [frame['key'] for frame in self.frames]
+
+    def as_dict(self):
+        return {
+            'source_key': self.source_key,
+            'source_etag': self.source_etag,
+            'status': self.status,
+            'frames': self.frames,
+            'resume_frame': self.resume_frame,
+            'updated_at': time.time(),
+        }
+
+    def save(self):
+        body = json.dumps(self.as_dict()).encode('utf-8')
+        success, message = upload_bytes_to_s3(
+            body, self.bucket_name, manifest_key(self.output_prefix), content_type='application/json'
+        )
+        if success:
+            self._last_saved = time.monotonic()
+        else:
+            logger.warning(f"Could not save manifest for {self.source_key}: {message}")
+        return success, message
+
+    def add_frame(self, s3_key, frame_idx, commit_frame, box=None, thumbnail=None):
+        """Record an uploaded frame; ``commit_frame`` is where processing can resume after it."""
+        frame = {'key': s3_key, 'frame_idx': frame_idx}
+        if box is not None:
+            frame['box'] = [int(round(coordinate)) for coordinate in box]
+        if thumbnail is not None:
+            frame['thumbnail'] = thumbnail
+        self.frames.append(frame)
+        self.resume_frame = commit_frame
+        if time.monotonic() - self._last_saved >= MANIFEST_CHECKPOINT_SECONDS:
+            self.save()
+
+    def complete(self):
+        self.status = 'complete'
+        return self.save()
+
+
+def read_manifest(bucket_name, output_prefix):
+    """The stored manifest dict of one video folder, or None if there is none."""
+    try:
+        response = get_s3_client().get_object(Bucket=bucket_name, Key=manifest_key(output_prefix))
+        return json.loads(response['Body'].read())
+    except ClientError as e:
+        if e.response['Error']['Code'] not in ('NoSuchKey', '404'):
+            logger.warning(f"Could not read manifest of {output_prefix}: {e}")
+    except ValueError as e:
+        logger.warning(f"Ignoring unreadable manifest of {output_prefix}: {e}")
+    return None
+
+
+def list_video_manifests(bucket_name, folder_prefix):
+    """
+    Return (video name, manifest dict) for every processed video directly
+    under ``folder_prefix``, sorted by video name. Raises on listing errors.
+    """
+    folder_prefix = folder_prefix.rstrip('/') + '/'
+    paginator = get_s3_client().get_paginator('list_objects_v2')
+    video_prefixes = []
+    for page in paginator.paginate(Bucket=bucket_name, Prefix=folder_prefix, Delimiter='/'):
+        video_prefixes.extend(common['Prefix'].rstrip('/') for common in page.get('CommonPrefixes', []))
+    video_prefixes.sort()
+
+    with ThreadPoolExecutor(max_workers=MANIFEST_READ_WORKERS, thread_name_prefix='manifest-read') as executor:
+        manifests = list(executor.map(lambda prefix: read_manifest(bucket_name, prefix), video_prefixes))
+    return [
+        (os.path.basename(prefix), manifest)
+        for prefix, manifest in zip(video_prefixes, manifests) if manifest is not None
+    ]
@@ -0,0 +1,139 @@
+"""
+The wagon capture state machine, independent of decoding and inference.
+
+Driven by a stream of (frame_idx, wagon boxes) it decides which frame to keep
+for every wagon passing the camera. It has no dependencies beyond the
+standard library, so recorded detection traces (see detection_cache) can be
+replayed through it with any settings in milliseconds.
+"""
+import collections
+
+# --- Default capture settings ---
+CONFIDENCE_THRESHOLD = 0.6
+WAGON_CLASS_ID = 1  # Assuming '1' is the class ID for wagons
+CAPTURE_DELAY = 5
+FRAME_BUFFER_SIZE = CAPTURE_DELAY + 1
+
+
+# A committed wagon capture. ``frame`` is whatever the tracker was fed: an
+# image, or a FramePool slot index when the tracker works on a pool.
+CapturedFrame = collections.namedtuple('CapturedFrame', ['frame_idx', 'frame', 'box'])
+
+
+class WagonCaptureTracker:
+    """
+    Decides which frame to keep for every wagon passing the camera.
+
+    Frames are fed in order together with their wagon boxes. While a single
+    wagon is passing, the frame ``capture_delay`` frames behind the newest one is
+    kept as the candidate whenever both show exactly one wagon. The candidate
+    is committed once the wagon has left the view.
+
+    With a ``pool``, frames are FramePool slot indices: the tracker takes over
+    the reference of every slot it is fed and hands the reference of a
+    committed slot to the caller, who must release it.
+    """
+
+    def __init__(self, pool=None, capture_delay=CAPTURE_DELAY):
+        self.pool = pool
+        self.buffer_size = capture_delay + 1
+        self.frame_buffer = collections.deque(maxlen=self.buffer_size)
+        self.state = "SEARCHING_FOR_WAGON"
+        self.potential_capture = None
+
+    def _release(self, frame):
+        if self.pool is not None:
+            self.pool.release(frame)
+
+    def _set_potential_capture(self, capture):
+        if self.pool is not None and capture is not None:
+            self.pool.retain(capture.frame)
+        if self.potential_capture is not None:
+            self._release(self.potential_capture.frame)
+        self.potential_capture = capture
+
+    def update(self, frame, wagon_boxes, frame_idx=None):
+        """Feed the next frame. Returns the committed CapturedFrame, if any."""
+        evicted = self.frame_buffer[0] if len(self.frame_buffer) == self.buffer_size else None
+        self.frame_buffer.append(CapturedFrame(frame_idx, frame, wagon_boxes))
+        if evicted is not None:
+            self._release(evicted.frame)
+        if len(self.frame_buffer) < self.buffer_size:
+            return None
+
+        num_current_wagon_boxes = len(wagon_boxes)
+        oldest_in_buf = self.frame_buffer[0]
+        num_oldest_wagon_boxes_in_buf = len(oldest_in_buf.box)
+
+        if self.state == "SEARCHING_FOR_WAGON":
+            if num_current_wagon_boxes == 1:
+                self.state = "SINGLE_WAGON_PASSING"
+                self._set_potential_capture(None)
+        elif self.state == "SINGLE_WAGON_PASSING":
+            if num_current_wagon_boxes == 1:
+                if num_oldest_wagon_boxes_in_buf == 1:
+                    self._set_potential_capture(oldest_in_buf._replace(box=oldest_in_buf.box[0]))
+            else:
+                captured = self.potential_capture
+                self.potential_capture = None
+                self.state = "SEARCHING_FOR_WAGON"
+                return captured
+        return None
+
+    def finish(self):
+        """Commit the wagon still passing when the video ends, if any, and drop the buffer."""
+        captured = None
+        if self.state == "SINGLE_WAGON_PASSING":
+            captured = self.potential_capture
+            self.potential_capture = None
+        else:
+            self._set_potential_capture(None)
+        self.state = "SEARCHING_FOR_WAGON"
+
+        while self.frame_buffer:
+            self._release(self.frame_buffer.popleft().frame)
+        return captured
+
+
+def wagon_boxes_from_detections(detections, confidence_threshold=CONFIDENCE_THRESHOLD, wagon_class_id=WAGON_CLASS_ID):
+    """
+    Extract the xyxy coordinates of confidently detected wagons from a
+    detector's [N, 6] output (an array or a list of rows).
+    """
+    rows = detections.tolist() if hasattr(detections, 'tolist') else detections
+    wagon_boxes = []
+    for x1, y1, x2, y2, conf, cls_id in rows:
+        if int(cls_id) == wagon_class_id and conf >= confidence_threshold:
+            wagon_boxes.append([x1, y1, x2, y2])
+    return wagon_boxes
+
+
+def capture_wagons(frames, capture_delay=CAPTURE_DELAY):
+    """
+    Run a stream of (frame_idx, wagon boxes) through a fresh tracker and return
+    the committed CapturedFrame of every wagon; ``frame`` is the frame index.
+    """
+    tracker = WagonCaptureTracker(capture_delay=capture_delay)
+    captures = []
+    for frame_idx, wagon_boxes in frames:
+        captured = tracker.update(frame_idx, wagon_boxes, frame_idx=frame_idx)
+        if captured is not None:
+            captures.append(captured)
+    captured = tracker.finish()
+    if captured is not None:
+        captures.append(captured)
+    return captures
+
+
+def replay_wagon_captures(video_detections, confidence_threshold=CONFIDENCE_THRESHOLD, capture_delay=CAPTURE_DELAY,
+                          wagon_class_id=WAGON_CLASS_ID):
+    """
+    Replay per-frame detector output (e.g. cached VideoDetections) through the
+    state machine without decoding or inference. Detections are cached at
+    CONFIDENCE_THRESHOLD, so lower thresholds behave like CONFIDENCE_THRESHOLD.
+    """
+    frames = (
+        (frame_idx, wagon_boxes_from_detections(detections, confidence_threshold, wagon_class_id))
+        for frame_idx, detections in enumerate(video_detections, start=1)
+    )
+    return capture_wagons(frames, capture_delay=capture_delay)
@@ -0,0 +1,21 @@
+
+import boto3
+import pytest
+from moto import mock_s3
+
+from services.s3_utils import reset_s3_clients
+
+BUCKET = 'test-bucket'
+
+
+@pytest.fixture
+def s3_bucket(monkeypatch):
+    """An empty moto bucket; the process-wide S3 client is rebuilt against it."""
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    monkeypatch.setenv('AWS_REGION', 'us-east-1')
+    with mock_s3():
+        reset_s3_clients()
+        boto3.client('s3', region_name='us-east-1').create_bucket(Bucket=BUCKET)
+        yield BUCKET
+    reset_s3_clients()
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from services.frame_extractor import FrameExtractor
+from services.motion_gate import MotionGate
+from services.wagon_capture import WAGON_CLASS_ID, replay_wagon_captures
+from tests.test_streamed_extraction import WAGON_BGR, ColourDetector
+
+WIDTH, HEIGHT = 160, 90
+
+
+def synthetic_frames():
+    """Empty track, then three wagons crossing with stretches of empty track between them."""
+    frames = []
+    for wagon in range(3):
+        frames += [np.full((HEIGHT, WIDTH, 3), 90, dtype=np.uint8) for _ in range(40)]
+        for step in range(30):
+            frame = np.full((HEIGHT, WIDTH, 3), 90, dtype=np.uint8)
+            left = WIDTH - step * 8
+            frame[20:70, max(0, left):max(0, left + 60)] = WAGON_BGR
+            frames.append(frame)
+    return frames + [np.full((HEIGHT, WIDTH, 3), 90, dtype=np.uint8) for _ in range(40)]
+
+
+class CountingDetector(ColourDetector):
+    def __init__(self):
+        self.frames_seen = 0
+
+    def detect(self, frames, conf, image_size=None):
+        self.frames_seen += len(frames)
+        return super().detect(frames, conf, image_size)
+
+
+def as_detections(wagon_boxes):
+    return np.array([[*box, 0.9, WAGON_CLASS_ID] for box in wagon_boxes], dtype=np.float32).reshape(-1, 6)
+
+
+def run(frames, batch_size, motion_gate=None):
+    extractor = FrameExtractor(model_path='missing.pt')
+    extractor.model = CountingDetector()
+    video_detections = []
+    for start in range(0, len(frames), batch_size):
+        batch = frames[start:start + batch_size]
+        for wagon_boxes in extractor.detect_wagons(extractor.model, batch, motion_gate=motion_gate):
+            video_detections.append(as_detections(wagon_boxes))
+    return video_detections, extractor.model.frames_seen
+
+
+def capture_indices(video_detections):
+    return [captured.frame_idx for captured in replay_wagon_captures(video_detections)]
+
+
+def test_reference_run_captures_every_wagon():
+    video_detections, frames_seen = run(synthetic_frames(), batch_size=8)
+    assert len(capture_indices(video_detections)) == 3
+    assert frames_seen == len(video_detections)
+
+
+@pytest.mark.parametrize('batch_size', [1, 8, 32])
+def test_gated_run_captures_the_same_wagons(batch_size):
+    frames = synthetic_frames()
+    reference, _ = run(frames, batch_size=8)
+
+    gate = MotionGate(dense_frames=2)
+    gated, frames_seen = run(frames, batch_size, motion_gate=gate)
+
+    assert capture_indices(gated) == capture_indices(reference)
+    report = gate.report()
+    assert report['frames'] == len(frames)
+    # Every frame sent to the detector is counted, including ones the gate then skipped
+    assert report['inferences'] == frames_seen
+    assert report['skipped'] == len(frames) - frames_seen > 0
+    # Batches are sent together, so some lookahead frames turn out not to be needed
+    assert (report['discarded'] > 0) == (batch_size > 1)
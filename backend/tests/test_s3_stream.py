@@ -0,0 +1,52 @@
+import os
+
+import boto3
+import pytest
+from botocore.exceptions import ClientError
+
+from services.s3_stream import S3RangeReader, StreamFailed, s3_video_fifo
+
+CHUNK_SIZE = 1024
+
+
+def put_object(bucket, key, body):
+    boto3.client('s3', region_name='us-east-1').put_object(Bucket=bucket, Key=key, Body=body)
+
+
+def fail_chunk(monkeypatch, failing_index):
+    fetch = S3RangeReader._fetch
+
+    def flaky_fetch(reader, index):
+        if index == failing_index:
+            raise ClientError({'Error': {'Code': 'InternalError', 'Message': 'ranged GET failed'}}, 'GetObject')
+        return fetch(reader, index)
+
+    monkeypatch.setattr(S3RangeReader, '_fetch', flaky_fetch)
+
+
+def read_fifo(fifo_path):
+    with open(fifo_path, 'rb') as fifo:
+        return fifo.read()
+
+
+def test_fifo_streams_whole_object(s3_bucket, tmp_path):
+    body = os.urandom(10 * CHUNK_SIZE + 17)
+    put_object(s3_bucket, 'videos/clip.avi', body)
+
+    with s3_video_fifo(s3_bucket, 'videos/clip.avi', str(tmp_path), chunk_size=CHUNK_SIZE) as (fifo_path, check):
+        assert read_fifo(fifo_path) == body
+        check()
+
+
+def test_failed_range_is_not_a_normal_end(s3_bucket, tmp_path, monkeypatch):
+    body = os.urandom(10 * CHUNK_SIZE)
+    put_object(s3_bucket, 'videos/clip.avi', body)
+    fail_chunk(monkeypatch, 3)
+
+    with pytest.raises(StreamFailed):
+        with s3_video_fifo(s3_bucket, 'videos/clip.avi', str(tmp_path), chunk_size=CHUNK_SIZE) as (fifo_path, check):
+            # The decoder sees an early end of file ...
+            assert read_fifo(fifo_path) == body[:3 * CHUNK_SIZE]
+            # ... which check() tells apart from the end of the video
+            with pytest.raises(StreamFailed):
+                check()
@@ -0,0 +1,104 @@
+import functools
+
+import boto3
+import cv2
+import numpy as np
+import pytest
+
+from services import frame_extractor
+from services.detection_cache import detection_cache_key
+from services.frame_extractor import FrameExtractor
+from services.s3_stream import S3RangeReader, StreamFailed, s3_video_fifo
+from services.video_manifest import read_manifest
+from tests.test_s3_stream import fail_chunk, put_object
+
+CHUNK_SIZE = 64 * 1024
+VIDEO_KEY = 'videos/clip.avi'
+OUTPUT_PREFIX = 'frames/clip'
+WAGON_BGR = (40, 70, 150)
+
+
+def write_clip(path, num_frames=240, width=320, height=180, num_wagons=4):
+    """Motion-JPEG AVI of solid 'wagons' crossing the frame, so it streams without an index."""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 25, (width, height))
+    frames_per_wagon = num_frames // num_wagons
+    for i in range(num_frames):
+        frame = np.full((height, width, 3), 90, dtype=np.uint8)
+        # Noise keeps the JPEGs large enough to span several stream chunks
+        frame += np.random.default_rng(i).integers(0, 40, frame.shape, dtype=np.uint8)
+        t = i % frames_per_wagon
+        if t < frames_per_wagon // 2:
+            left = width - t * 2 * width // (frames_per_wagon // 2)
+            cv2.rectangle(frame, (left, 40), (left + width // 2, 140), WAGON_BGR, -1)
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+class ColourDetector:
+    """Reports the wagon-coloured region of each frame as a class 1 detection."""
+
+    model_path = None
+
+    def detect(self, frames, conf, image_size=None):
+        batch = []
+        for frame in frames:
+            mask = (np.abs(frame.astype(int) - WAGON_BGR).max(axis=2) < 30)
+            ys, xs = np.nonzero(mask)
+            if len(xs) < 200:
+                batch.append(np.zeros((0, 6), dtype=np.float32))
+            else:
+                batch.append(np.array([[xs.min(), ys.min(), xs.max(), ys.max(), 0.9, 1]], dtype=np.float32))
+        return batch
+
+
+@pytest.fixture
+def extractor(s3_bucket, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(frame_extractor, 's3_video_fifo', functools.partial(s3_video_fifo, chunk_size=CHUNK_SIZE))
+    with open(write_clip(str(tmp_path / 'clip.avi')), 'rb') as clip:
+        put_object(s3_bucket, VIDEO_KEY, clip.read())
+
+    extractor = FrameExtractor(model_path=str(tmp_path / 'missing.pt'))
+    extractor.model = ColourDetector()
+    return extractor
+
+
+def extract(extractor, bucket):
+    return extractor.extract_frames_from_video_s3(
+        VIDEO_KEY, bucket, OUTPUT_PREFIX, streaming=True, resume=True, detection_cache=True,
+        motion_gating=False, scouting=False
+    )
+
+
+def cached_detection_exists(bucket, model_version):
+    client = boto3.client('s3', region_name='us-east-1')
+    etag = client.head_object(Bucket=bucket, Key=VIDEO_KEY)['ETag']
+    listing = client.list_objects_v2(Bucket=bucket, Prefix=detection_cache_key(etag, model_version))
+    return listing.get('KeyCount', 0) > 0
+
+
+def test_streamed_video_completes_manifest(extractor, s3_bucket):
+    result = extract(extractor, s3_bucket)
+
+    assert result['success'] and result['count'] == 4
+    assert read_manifest(s3_bucket, OUTPUT_PREFIX)['status'] == 'complete'
+    assert cached_detection_exists(s3_bucket, extractor.model_version)
+
+
+def test_failed_range_does_not_complete_manifest(extractor, s3_bucket, monkeypatch):
+    fetch = S3RangeReader._fetch
+    fail_chunk(monkeypatch, 3)
+
+    with pytest.raises(StreamFailed):
+        extract(extractor, s3_bucket)
+
+    manifest = read_manifest(s3_bucket, OUTPUT_PREFIX)
+    assert manifest is None or manifest['status'] == 'partial'
+    assert not cached_detection_exists(s3_bucket, extractor.model_version)
+
+    # Once S3 recovers, the rerun picks the video up again instead of skipping it
+    monkeypatch.setattr(S3RangeReader, '_fetch', fetch)
+    result = extract(extractor, s3_bucket)
+    assert result['success'] and not result.get('skipped') and result['count'] == 4
+    assert read_manifest(s3_bucket, OUTPUT_PREFIX)['status'] == 'complete'
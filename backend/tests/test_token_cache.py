@@ -0,0 +1,38 @@
+import time
+
+from services.token_cache import VerifiedTokenCache
+
+
+def test_entry_expires_at_token_exp():
+    cache = VerifiedTokenCache(maxsize=8, ttl=300)
+    cache.put('expired', {'username': 'admin', 'exp': time.time() - 1})
+    cache.put('valid', {'username': 'admin', 'exp': time.time() + 60})
+
+    assert cache.get('expired') is None
+    assert cache.get('valid')['username'] == 'admin'
+    assert cache.stats()['size'] == 1
+
+
+def test_entry_expires_after_ttl():
+    cache = VerifiedTokenCache(maxsize=8, ttl=0)
+    cache.put('token', {'username': 'admin', 'exp': time.time() + 60})
+    assert cache.get('token') is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = VerifiedTokenCache(maxsize=2, ttl=300)
+    cache.put('a', {'username': 'a'})
+    cache.put('b', {'username': 'b'})
+    cache.get('a')
+    cache.put('c', {'username': 'c'})
+
+    assert cache.get('b') is None
+    assert cache.get('a')['username'] == 'a'
+    assert cache.get('c')['username'] == 'c'
+
+
+def test_returned_claims_are_copies():
+    cache = VerifiedTokenCache(maxsize=2, ttl=300)
+    cache.put('token', {'username': 'admin'})
+    cache.get('token')['username'] = 'mallory'
+    assert cache.get('token')['username'] == 'admin'
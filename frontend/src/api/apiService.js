@@ -84,6 +84,51 @@ export const getTaskStatus = async (taskId) => {
     return response.json();
 };
 
+/**
+ * Streams the progress of a Celery task from the Server-Sent Events endpoint.
+ * EventSource can not send the Authorization header, so the stream is read
+ * with fetch. Calls onEvent(event, data) for every event and resolves when the
+ * server closes the stream; throws if the stream is unavailable.
+ */
+export const streamTaskEvents = async (taskId, onEvent, signal) => {
+    const response = await fetchWithAuth(`${API_URL}/task-events/${taskId}`, {
+        headers: { ...getAuthHeaders(false), 'Accept': 'text/event-stream' },
+        signal,
+    });
+    if (!response.ok || !response.body) {
+        throw new Error(`Progress stream unavailable (${response.status}).`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    for (;;) {
+        const { value, done } = await reader.read();
+        if (done) {
+            return;
+        }
+        buffer += decoder.decode(value, { stream: true });
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const block = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            let event = 'message';
+            const data = [];
+            // Comment lines (keep-alives) and retry hints are skipped
+            for (const line of block.split('\n')) {
+                if (line.startsWith('event:')) {
+                    event = line.slice(6).trim();
+                } else if (line.startsWith('data:')) {
+                    data.push(line.slice(5).trim());
+                }
+            }
+            if (data.length) {
+                onEvent(event, JSON.parse(data.join('\n')));
+            }
+        }
+    }
+};
+
 /**
  * Sends a request to cancel a running Celery task.
  */
@@ -107,6 +152,19 @@ export const retrieveVideos = async (formData) => {
     return response.json();
 };
 
+/**
+ * Fetches one page of the wagon frame gallery of a processed folder
+ * (same criteria as retrieveVideos, plus page and page_size).
+ */
+export const getGallery = async (criteria) => {
+    const response = await fetchWithAuth(`${API_URL}/gallery`, {
+        method: 'POST',
+        headers: getAuthHeaders(),
+        body: JSON.stringify(criteria),
+    });
+    return response.json();
+};
+
 /**
  * Uploads a video file directly to the S3 bucket.
  */
@@ -1,5 +1,5 @@
 import React, { createContext, useState, useRef, useEffect, useContext } from 'react';
-import { getTaskStatus, processS3Videos, cancelTask as apiCancelTask } from '../api/apiService';
+import { getTaskStatus, streamTaskEvents, processS3Videos, cancelTask as apiCancelTask } from '../api/apiService';
 import { toast } from 'react-toastify';
 
 export const TaskContext = createContext();
@@ -14,8 +14,13 @@ export const TaskProvider = ({ children }) => {
     const [taskResult, setTaskResult] = useState(null);
     const [error, setError] = useState(null);
     const pollIntervalRef = useRef(null);
+    const streamAbortRef = useRef(null);
 
     const clearTask = () => {
+        if (streamAbortRef.current) {
+            streamAbortRef.current.abort();
+            streamAbortRef.current = null;
+        }
         if (pollIntervalRef.current) {
             clearInterval(pollIntervalRef.current);
             pollIntervalRef.current = null;
@@ -77,6 +82,41 @@ export const TaskProvider = ({ children }) => {
         }, 2000);
     };
 
+    /**
+     * Follows a task over the /task-events stream. Falls back to polling
+     * /task-status if the stream is unavailable; once the task has finished,
+     * /task-status is polled for the result, which the stream does not carry.
+     */
+    const watchTask = async (id) => {
+        const controller = new AbortController();
+        streamAbortRef.current = controller;
+        let received = false;
+        let finished = false;
+        try {
+            await streamTaskEvents(id, (event, data) => {
+                received = true;
+                if (event === 'progress') {
+                    if (data.progress !== undefined) setTaskProgress(data.progress);
+                    if (data.status !== undefined) setTaskStatusText(data.status);
+                } else if (event === 'end') {
+                    finished = true;
+                }
+            }, controller.signal);
+        } catch (err) {
+            if (controller.signal.aborted) return;
+            pollTaskStatus(id);
+            return;
+        }
+        if (controller.signal.aborted) return;
+
+        if (received && !finished) {
+            // The server closes long-lived streams; reconnect for a fresh snapshot
+            watchTask(id);
+        } else {
+            pollTaskStatus(id);
+        }
+    };
+
     const startS3FrameExtraction = async (folderToProcess) => {
         clearTask();
         setTaskState('PROCESSING');
@@ -84,7 +124,7 @@ export const TaskProvider = ({ children }) => {
             const response = await processS3Videos(folderToProcess);
             if (response.success) {
                 setTaskId(response.task_id);
-                pollTaskStatus(response.task_id);
+                watchTask(response.task_id);
             } else {
                 setTaskState('FAILURE');
                 setError(response.error || 'Failed to start task.');
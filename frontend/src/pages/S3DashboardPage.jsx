@@ -153,12 +153,13 @@ const S3DashboardPage = () => {
         };
         setRecentUploads(prev => [newUpload, ...prev].slice(0, 10));
 
+        // The fields go first: the server streams the video to S3 as it arrives
         const formData = new FormData();
-        formData.append('video', selectedFile);
         formData.append('upload_date', uploadDate);
         formData.append('camera_angle', cameraAngle);
         formData.append('video_type', videoType);
         formData.append('user_name', localStorage.getItem('username') || 'Unknown User');
+        formData.append('video', selectedFile);
 
         try {
             const response = await uploadVideoToS3(formData, abortControllerRef.current.signal);
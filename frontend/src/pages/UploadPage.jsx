@@ -1,6 +1,8 @@
 import React, { useState, useEffect, useContext } from 'react';
 import { TaskContext } from '../context/TaskContext.jsx';
-import { retrieveVideos } from '../api/apiService.js';
+import { retrieveVideos, getGallery } from '../api/apiService.js';
+
+const GALLERY_PAGE_SIZE = 16;
 
 const UploadPage = () => {
     const [retrieveDate, setRetrieveDate] = useState('');
@@ -11,6 +13,9 @@ const UploadPage = () => {
     const [folders, setFolders] = useState([]);
     const [selectedFolderId, setSelectedFolderId] = useState('');
     const [error, setError] = useState('');
+    const [criteria, setCriteria] = useState(null);
+    const [gallery, setGallery] = useState(null);
+    const [galleryPage, setGalleryPage] = useState(1);
 
     const {
         taskState,
@@ -28,6 +33,21 @@ const UploadPage = () => {
         setRetrieveDate(today);
     }, []);
 
+    useEffect(() => {
+        // Extracted frames are browsed page by page as thumbnails from /gallery
+        if (taskState !== 'SUCCESS' || !criteria) return;
+        let cancelled = false;
+        getGallery({ ...criteria, page: galleryPage, page_size: GALLERY_PAGE_SIZE })
+            .then(response => {
+                if (!cancelled) setGallery(response.success ? response : null);
+            })
+            .catch(err => {
+                console.error(err);
+                if (!cancelled) setGallery(null);
+            });
+        return () => { cancelled = true; };
+    }, [taskState, criteria, galleryPage]);
+
     const handleRetrieve = async (e) => {
         e.preventDefault();
         setIsLoading(true);
@@ -46,6 +66,7 @@ const UploadPage = () => {
         try {
             const response = await retrieveVideos(formData);
             if (response.success) {
+                setCriteria(formData);
                 if (response.folders.length === 0) {
                     setError('No videos found for the specified criteria.');
                 }
@@ -67,6 +88,8 @@ const UploadPage = () => {
             alert("Please select a folder to process.");
             return;
         }
+        setGallery(null);
+        setGalleryPage(1);
         startS3FrameExtraction(folderToProcess);
     };
 
@@ -75,6 +98,8 @@ const UploadPage = () => {
         setFolders([]);
         setSelectedFolderId('');
         setError('');
+        setGallery(null);
+        setGalleryPage(1);
     };
 
     const selectedFolder = folders.find(f => f.id === selectedFolderId);
@@ -104,7 +129,11 @@ const UploadPage = () => {
 
     // Render success/results state
     if (taskState === 'SUCCESS') {
-        const framesToShow = taskResult?.result?.slice(0, 16) || [];
+        // The task result's full-size URLs are only shown if /gallery is unavailable
+        const framesToShow = gallery
+            ? gallery.frames.map(frame => ({ src: frame.thumbnail_url, href: frame.url }))
+            : (taskResult?.result?.slice(0, GALLERY_PAGE_SIZE) || []).map(url => ({ src: url, href: url }));
+        const galleryPages = gallery ? Math.max(1, Math.ceil(gallery.total / gallery.page_size)) : 1;
         return (
             <div className="data-section fade-in">
                 <div className="section-header">
@@ -114,19 +143,32 @@ const UploadPage = () => {
                 <div className="p-4">
                     <div className="alert alert-success" role="alert">
                         Successfully extracted <strong>{taskResult?.count || 0}</strong> frames.
-                        {taskResult?.count > 16 && ` Showing the first 16.`}
+                        {!gallery && taskResult?.count > GALLERY_PAGE_SIZE && ` Showing the first ${GALLERY_PAGE_SIZE}.`}
                     </div>
                      <div className="wagon-grid">
                         {framesToShow.length > 0 ? (
-                            framesToShow.map((frameUrl, index) => (
-                                <div key={index} className="wagon-card" style={{padding: 0, border: 'none'}}>
-                                    <img src={frameUrl} alt={`Frame ${index + 1}`} style={{width: '100%', height: 'auto', borderRadius: '8px', boxShadow: 'var(--shadow-sm)'}} />
+                            framesToShow.map((frame, index) => (
+                                <div key={frame.href} className="wagon-card" style={{padding: 0, border: 'none'}}>
+                                    <a href={frame.href} target="_blank" rel="noopener noreferrer">
+                                        <img src={frame.src} alt={`Frame ${(galleryPage - 1) * GALLERY_PAGE_SIZE + index + 1}`} loading="lazy" style={{width: '100%', height: 'auto', borderRadius: '8px', boxShadow: 'var(--shadow-sm)'}} />
+                                    </a>
                                 </div>
                             ))
                         ) : (
                             <p className="text-center text-muted col-span-full">No wagons were detected in the video.</p>
                         )}
                     </div>
+                    {galleryPages > 1 && (
+                        <div className="d-flex justify-content-center align-items-center gap-3 mt-4">
+                            <button className="action-btn outline" onClick={() => setGalleryPage(galleryPage - 1)} disabled={galleryPage <= 1}>
+                                <i className="fas fa-chevron-left me-1"></i>Previous
+                            </button>
+                            <span className="text-muted">Page {galleryPage} of {galleryPages}</span>
+                            <button className="action-btn outline" onClick={() => setGalleryPage(galleryPage + 1)} disabled={galleryPage >= galleryPages}>
+                                Next<i className="fas fa-chevron-right ms-1"></i>
+                            </button>
+                        </div>
+                    )}
                 </div>
             </div>
         );